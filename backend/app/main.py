@@ -1,11 +1,42 @@
 # Entry point for FastAPI backend
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+from .routes import counsellors, counselees, chatbot, analytics, search
+from .nlp import batch
+from .utils.db import init_db, snapshotter, DB_MODE
+from .utils.search import start_backfill_if_pending
+from .utils import admission, timing
+from .utils.timing import TimedRoute, TimingMiddleware
+
+ACCESS_LOG = os.environ.get("LUMA_ACCESS_LOG", "1") != "0"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # index transcripts written before full-text search existed; started per
+    # worker (not at import) so a preloading master never forks a running thread
+    start_backfill_if_pending()
+    if snapshotter:
+        snapshotter.start()
+    if ACCESS_LOG:
+        timing.start_access_log()
+    chatbot.admission_controller.start_monitor()
+    yield
+    chatbot.admission_controller.stop_monitor()
+    timing.stop_access_log()
+    # write out queued chatbot exchanges before exiting
+    chatbot.conversation_writer.stop()
+    batch.shutdown_pool()
+    if snapshotter:
+        snapshotter.stop()
 
-from .routes import counsellors, counselees, chatbot
-from .utils.db import init_db
 
-app = FastAPI(title="Luma Backend")
+app = FastAPI(title="Luma Backend", lifespan=lifespan)
+app.router.route_class = TimedRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,7 +44,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Request-ID"],
 )
+# compress large listings / transcripts; small replies are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# count chatbot queries over the whole request for admission control
+app.add_middleware(admission.InFlightMiddleware, controller=chatbot.admission_controller,
+                   path="/api/chatbot/query")
+# outermost: per-stage Server-Timing, X-Request-ID and one JSON access-log line per request
+app.add_middleware(TimingMiddleware)
 
 # initialize DB (creates tables if missing)
 init_db()
@@ -22,8 +61,13 @@ init_db()
 app.include_router(counsellors.router, prefix="/api/counsellors", tags=["counsellors"])
 app.include_router(counselees.router, prefix="/api/counselees", tags=["counselees"])
 app.include_router(chatbot.router, prefix="/api/chatbot", tags=["chatbot"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
 
 
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "app": "luma-backend"}
+    storage = {"mode": DB_MODE}
+    if snapshotter:
+        storage["last_snapshot"] = snapshotter.last_snapshot
+    return {"status": "ok", "app": "luma-backend", "storage": storage}
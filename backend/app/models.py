@@ -19,6 +19,11 @@ class Counsellor(BaseModel):
     status: Optional[str] = None
 
 
+class CounsellorStatusBatch(BaseModel):
+    ids: List[int]
+    status: str
+
+
 class SessionCreateResponse(BaseModel):
     session_id: str
 
@@ -28,6 +33,14 @@ class BotQuery(BaseModel):
     conversation_history: Optional[List[dict]] = None
     session_id: Optional[str] = None
 
+class BatchAnalyzeRequest(BaseModel):
+    # either inline messages, or a range of rows from the messages table
+    messages: Optional[List[str]] = None
+    from_id: Optional[int] = None
+    to_id: Optional[int] = None
+    write_back: bool = False
+    chunk_size: int = 200
+
 class BotResponse(BaseModel):
     reply: str
     sentiment: dict
@@ -0,0 +1,173 @@
+# Offline batch scoring of messages across a process pool.
+#
+# Re-score stored transcripts (from backend/):
+#   python -m app.nlp.batch --from-id 1 --to-id 500000 --write-back
+# or score an NDJSON file of {"message": ...} lines (use - for stdin):
+#   python -m app.nlp.batch --input messages.ndjson > scores.ndjson
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ..utils.db import get_db_conn
+
+DEFAULT_CHUNK_SIZE = 200
+# keyword mode for pool workers (default: LUMA_KEYWORD_MODE, as in the API process)
+KEYWORD_MODE = os.environ.get("LUMA_ANALYZE_KEYWORD_MODE") or None
+
+# Per-process analyzer, created by the pool initializer
+_analyzer = None
+_pool = None
+_pool_workers = 0
+
+
+def _init_worker(keyword_mode: Optional[str] = None):
+    global _analyzer
+    # Workers start from a clean interpreter (forkserver/spawn) and build their
+    # own analyzer; the categorizer follows LUMA_CATEGORIZER from the environment
+    from .sentiment_analyzer import SentimentAnalyzer
+    _analyzer = SentimentAnalyzer(keyword_mode=keyword_mode)
+
+
+def analyze_chunk(items: List[Tuple[object, str]]) -> List[dict]:
+    """Score one chunk of (key, text) pairs; runs inside a pool worker"""
+    if _analyzer is None:
+        _init_worker(KEYWORD_MODE)
+    texts = [text or "" for _, text in items]
+    categories = _analyzer.categorize_many(texts)
+    results = []
+    for (key, _), text, category in zip(items, texts, categories):
+        sentiment = _analyzer.analyze_sentiment(text)
+        crisis = _analyzer.detect_crisis_indicators(text)
+        results.append({
+            "key": key,
+            "sentiment": sentiment["sentiment"],
+            "polarity": sentiment["polarity"],
+            "intensity": sentiment["intensity"],
+            "crisis_level": crisis["risk_level"],
+            "crisis_indicators": crisis["indicators"],
+            "category": category,
+            "keywords": _analyzer.extract_keywords(text),
+        })
+    return results
+
+
+def _pool_context():
+    # Never fork: the pool is created lazily inside a running server, whose other
+    # threads may hold locks (engine, logging, sqlite) at the moment of fork()
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool shared by API requests and the CLI (created on first use)"""
+    global _pool, _pool_workers
+    if _pool is None:
+        _pool_workers = int(os.environ.get("LUMA_ANALYZE_WORKERS", "0")) or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=_pool_context(),
+                                    initializer=_init_worker, initargs=(KEYWORD_MODE,))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def analyze_stream(items: Iterable[Tuple[object, str]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   max_pending: Optional[int] = None) -> Iterator[List[dict]]:
+    """Yield scored chunks in input order, keeping at most max_pending chunks in flight"""
+    pool = get_pool()
+    max_pending = max_pending or _pool_workers * 2
+    pending = deque()
+    for chunk in _chunks(items, chunk_size):
+        pending.append(pool.submit(analyze_chunk, chunk))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_message_rows(from_id: int, to_id: Optional[int], page_size: int = 5000) -> Iterator[Tuple[int, str]]:
+    """(id, message) pairs from the messages table, paged by id so no long read lock is held"""
+    conn = get_db_conn()
+    try:
+        last_id = from_id - 1
+        while True:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, message FROM messages WHERE id > ? AND (? IS NULL OR id <= ?) ORDER BY id LIMIT ?",
+                (last_id, to_id, to_id, page_size)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def write_back(conn, results: List[dict]):
+    """Store sentiment/crisis/category for a chunk of message ids in one transaction"""
+    conn.executemany(
+        "UPDATE messages SET sentiment=?, crisis_level=?, category=? WHERE id=?",
+        [(r["sentiment"], r["crisis_level"], r["category"], r["key"]) for r in results]
+    )
+    conn.commit()
+
+
+def score_messages(from_id: int = 1, to_id: Optional[int] = None, store: bool = False,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[dict]:
+    """Score a range of stored messages, optionally writing the results back per chunk"""
+    conn = get_db_conn() if store else None
+    try:
+        for results in analyze_stream(iter_message_rows(from_id, to_id), chunk_size):
+            if conn is not None:
+                write_back(conn, results)
+            yield from results
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-score messages (NDJSON results on stdout)")
+    parser.add_argument("--input", help="NDJSON file of {\"message\": ...} lines, - for stdin")
+    parser.add_argument("--from-id", type=int, default=1)
+    parser.add_argument("--to-id", type=int)
+    parser.add_argument("--write-back", action="store_true", help="store results on the messages rows")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from ..utils.db import init_db
+    init_db()
+    if args.input:
+        source = sys.stdin if args.input == "-" else open(args.input)
+        lines = (json.loads(line) for line in source if line.strip())
+        items = ((i, row.get("message", "") if isinstance(row, dict) else str(row)) for i, row in enumerate(lines))
+        results = (r for chunk in analyze_stream(items, args.chunk_size) for r in chunk)
+        key_name = "index"
+    else:
+        results = score_messages(args.from_id, args.to_id, args.write_back, args.chunk_size)
+        key_name = "id"
+    for result in results:
+        result[key_name] = result.pop("key")
+        sys.stdout.write(json.dumps(result) + "\n")
@@ -0,0 +1,100 @@
+# TF-IDF + logistic regression classifier for concern categories.
+#
+# Train from the bundled corpus (from backend/):
+#   python -m app.nlp.category_classifier --corpus app/nlp/data/category_corpus.jsonl
+import argparse
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+DEFAULT_CORPUS = os.path.join(DATA_DIR, "category_corpus.jsonl")
+DEFAULT_MODEL_PATH = os.environ.get("LUMA_CATEGORY_MODEL", os.path.join(DATA_DIR, "category_model.joblib"))
+
+
+class CategoryClassifier:
+    """Vectorized concern categorizer; `predict` scores a whole batch in one matrix operation"""
+
+    def __init__(self, vectorizer: TfidfVectorizer, model: LogisticRegression, min_confidence: float = 0.35):
+        self.vectorizer = vectorizer
+        self.model = model
+        # Below this probability the message is treated as "general"
+        self.min_confidence = min_confidence
+        self.classes = np.asarray(model.classes_)
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[str], min_confidence: float = 0.35) -> "CategoryClassifier":
+        vectorizer = TfidfVectorizer(
+            lowercase=True, ngram_range=(1, 2), sublinear_tf=True, min_df=1, dtype=np.float32
+        )
+        features = vectorizer.fit_transform(texts)
+        model = LogisticRegression(C=10.0, max_iter=1000)
+        model.fit(features, labels)
+        return cls(vectorizer, model, min_confidence)
+
+    def predict(self, texts: List[str]) -> List[str]:
+        if not texts:
+            return []
+        proba = self.model.predict_proba(self.vectorizer.transform(texts))
+        best = proba.argmax(axis=1)
+        labels = self.classes[best]
+        labels = np.where(proba[np.arange(len(best)), best] >= self.min_confidence, labels, "general")
+        return labels.tolist()
+
+    def predict_one(self, text: str) -> str:
+        return self.predict([text])[0]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        joblib.dump(
+            {"vectorizer": self.vectorizer, "model": self.model, "min_confidence": self.min_confidence},
+            path, compress=3
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CategoryClassifier":
+        artifact = joblib.load(path)
+        return cls(artifact["vectorizer"], artifact["model"], artifact["min_confidence"])
+
+
+@lru_cache(maxsize=None)
+def load_classifier(path: str = DEFAULT_MODEL_PATH) -> Optional[CategoryClassifier]:
+    """Load the trained artifact once per process; None if it hasn't been trained"""
+    if not os.path.exists(path):
+        logger.warning(f"Category model not found at {path}; run python -m app.nlp.category_classifier")
+        return None
+    return CategoryClassifier.load(path)
+
+
+def read_corpus(path: str):
+    texts, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(row["category"])
+    return texts, labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the concern category classifier")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL with text/category fields")
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--min-confidence", type=float, default=0.35)
+    args = parser.parse_args()
+
+    texts, labels = read_corpus(args.corpus)
+    classifier = CategoryClassifier.train(texts, labels, args.min_confidence)
+    classifier.save(args.out)
+    print(f"trained on {len(texts)} examples ({len(classifier.classes)} classes) -> {args.out} "
+          f"({os.path.getsize(args.out) / 1024:.0f} KB)")
@@ -0,0 +1,42 @@
+# Process-wide NLP engine: one SentimentAnalyzer shared by the chatbot routes
+# and the ResponseGenerator, so stemmer/stopword/TextBlob state is
+# held once per process (and, with `python -m app.serve`, once per machine via
+# copy-on-write from the preloading master).
+import threading
+
+_lock = threading.Lock()
+_sentiment_analyzer = None
+_response_generator = None
+
+
+def get_sentiment_analyzer():
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        with _lock:
+            if _sentiment_analyzer is None:
+                from .sentiment_analyzer import SentimentAnalyzer
+                _sentiment_analyzer = SentimentAnalyzer()
+    return _sentiment_analyzer
+
+
+def get_response_generator():
+    global _response_generator
+    if _response_generator is None:
+        analyzer = get_sentiment_analyzer()
+        with _lock:
+            if _response_generator is None:
+                from .response_generator import ResponseGenerator
+                _response_generator = ResponseGenerator(sentiment_analyzer=analyzer)
+    return _response_generator
+
+
+def is_loaded() -> bool:
+    return _sentiment_analyzer is not None and _response_generator is not None
+
+
+def preload():
+    """Build the engine and warm lazily-initialized state so forked workers share it"""
+    generator = get_response_generator()
+    # First calls populate TextBlob's lexicon and the stem cache
+    generator.generate_response("hello, I feel stressed about work and my family")
+    return generator
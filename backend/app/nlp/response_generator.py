@@ -4,8 +4,9 @@ from typing import Dict, List
 from .sentiment_analyzer import SentimentAnalyzer
 
 class ResponseGenerator:
-    def __init__(self):
-        self.sentiment_analyzer = SentimentAnalyzer()
+    def __init__(self, sentiment_analyzer: SentimentAnalyzer = None):
+        # Pass the process-wide analyzer (nlp/engine.py) to avoid duplicating its state
+        self.sentiment_analyzer = sentiment_analyzer or SentimentAnalyzer()
         
         # Response templates based on sentiment and context
         self.responses = {
@@ -1,5 +1,7 @@
 # NLP utilities for sentiment analysis and text processing
+import os
 import re
+from functools import lru_cache
 import nltk
 from textblob import TextBlob
 from typing import Dict, List, Tuple
@@ -25,13 +27,36 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import PorterStemmer
 
+# Precompiled patterns for the fast keyword extractor
+_CLEAN_RE = re.compile(r'[^\w\s]')
+_TOKEN_RE = re.compile(r'\w{3,}')
+
+KEYWORD_MODES = ("nltk", "fast")
+CATEGORIZERS = ("keyword", "model")
+
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, keyword_mode: str = None, stem_cache_size: int = 4096, categorizer: str = None):
         self.stemmer = PorterStemmer()
         try:
-            self.stop_words = set(stopwords.words('english'))
+            self.stop_words = frozenset(stopwords.words('english'))
         except:
-            self.stop_words = set()
+            self.stop_words = frozenset()
+
+        # "nltk" keeps the Punkt tokenizer path, "fast" uses a regex tokenizer + stem cache
+        self.keyword_mode = keyword_mode or os.environ.get("LUMA_KEYWORD_MODE", "nltk")
+        if self.keyword_mode not in KEYWORD_MODES:
+            raise ValueError(f"Unknown keyword mode '{self.keyword_mode}', expected one of {KEYWORD_MODES}")
+        # Chat vocabulary is repetitive, so most stems are cache hits
+        self._stem = lru_cache(maxsize=stem_cache_size)(self.stemmer.stem)
+
+        # "keyword" is the substring vote, "model" the trained TF-IDF classifier
+        self.categorizer = categorizer or os.environ.get("LUMA_CATEGORIZER", "keyword")
+        if self.categorizer not in CATEGORIZERS:
+            raise ValueError(f"Unknown categorizer '{self.categorizer}', expected one of {CATEGORIZERS}")
+        self.category_classifier = None
+        if self.categorizer == "model":
+            from .category_classifier import load_classifier
+            self.category_classifier = load_classifier()
     
     def analyze_sentiment(self, text: str) -> Dict:
         """Analyze sentiment of the given text"""
@@ -68,6 +93,9 @@ class SentimentAnalyzer:
     
     def extract_keywords(self, text: str) -> List[str]:
         """Extract important keywords from text"""
+        if self.keyword_mode == "fast":
+            return self.extract_keywords_fast(text)
+
         # Clean and tokenize
         text = re.sub(r'[^\w\s]', '', text.lower())
         tokens = word_tokenize(text)
@@ -80,6 +108,14 @@ class SentimentAnalyzer:
                 keywords.append(stemmed)
         
         return list(set(keywords))  # Remove duplicates
+
+    def extract_keywords_fast(self, text: str) -> List[str]:
+        """Regex-tokenized, stem-cached keyword extraction (order-preserving, deduplicated)"""
+        # After punctuation is stripped, runs of word characters are the tokens
+        tokens = _TOKEN_RE.findall(_CLEAN_RE.sub('', text.lower()))
+        stop_words = self.stop_words
+        stem = self._stem
+        return list(dict.fromkeys(stem(token) for token in tokens if token not in stop_words))
     
     def detect_crisis_indicators(self, text: str) -> Dict:
         """Detect potential crisis or urgent help indicators"""
@@ -112,6 +148,18 @@ class SentimentAnalyzer:
         }
     
     def categorize_concern(self, text: str) -> str:
+        """Categorize the type of concern"""
+        if self.category_classifier is not None:
+            return self.category_classifier.predict_one(text)
+        return self.categorize_by_keywords(text)
+
+    def categorize_many(self, texts: List[str]) -> List[str]:
+        """Categorize a batch of messages (one matrix operation with the trained model)"""
+        if self.category_classifier is not None:
+            return self.category_classifier.predict(texts)
+        return [self.categorize_by_keywords(text) for text in texts]
+
+    def categorize_by_keywords(self, text: str) -> str:
         """Categorize the type of concern based on keywords"""
         categories = {
             "mental_health": [
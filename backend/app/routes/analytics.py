@@ -0,0 +1,57 @@
+# Read endpoints over the incrementally maintained rollup tables
+from fastapi import APIRouter, Query
+from typing import Optional
+from ..utils.timing import TimedRoute
+from ..utils.db import get_db_conn
+from ..utils.analytics import hour_bucket, WAIT_BUCKETS, OVERFLOW_BUCKET
+import time
+
+router = APIRouter(route_class=TimedRoute)
+
+MAX_HOURS = 24 * 31
+
+@router.get("/hourly")
+def hourly_counts(
+    event: Optional[str] = None,
+    hours: int = Query(24, ge=1, le=MAX_HOURS),
+):
+    """Per hour x category x crisis level counts for the last `hours` hours.
+
+    Events: session_started, message, bot_result, escalation, session_accepted.
+    """
+    since = hour_bucket(int(time.time())) - (hours - 1) * 3600
+    conn = get_db_conn()
+    cur = conn.cursor()
+    sql = "SELECT hour, event, category, crisis_level, count FROM rollup_hourly WHERE hour >= ?"
+    params = [since]
+    if event:
+        sql += " AND event = ?"
+        params.append(event)
+    cur.execute(sql + " ORDER BY hour ASC", params)
+    rows = cur.fetchall()
+    conn.close()
+    return {
+        "since": since,
+        "buckets": [
+            {"hour": r[0], "event": r[1], "category": r[2], "crisis_level": r[3], "count": r[4]}
+            for r in rows
+        ]
+    }
+
+@router.get("/wait-times")
+def wait_times():
+    """Histogram and average of the wait between session start and counsellor accept"""
+    conn = get_db_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT bucket, count, total_seconds FROM rollup_wait_times")
+    rows = {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+    conn.close()
+
+    labels = [str(b) for b in WAIT_BUCKETS] + [OVERFLOW_BUCKET]
+    accepted = sum(count for count, _ in rows.values())
+    total = sum(seconds for _, seconds in rows.values())
+    return {
+        "accepted_sessions": accepted,
+        "average_wait_seconds": round(total / accepted, 1) if accepted else None,
+        "histogram": [{"le": label, "count": rows.get(label, (0, 0))[0]} for label in labels]
+    }
@@ -1,6 +1,15 @@
 # Enhanced NLP-powered chatbot route with performance optimization
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from ..models import BotQuery
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from ..models import BotQuery, BatchAnalyzeRequest
+from ..utils import admission, analytics
+from ..utils.bulk import read_records
+from ..utils.timing import TimedRoute, stage
+from ..utils.db import get_db_conn
+from ..utils.task_queue import BatchingWriter
+import json
 from typing import Dict, List, Optional
 import logging
 import asyncio
@@ -12,13 +21,17 @@ import hashlib
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # Global variables for lazy loading
 response_generator = None
 sentiment_analyzer = None
 nlp_loading = False
 response_cache = {}
+admission_controller = admission.AdmissionController.from_env()
+
+# Checked on every path, including degraded and shed requests
+CRISIS_KEYWORDS = ['suicide', 'kill myself', 'end it all', 'hurt myself', 'want to die', 'no point']
 
 # Fast response templates for immediate replies
 QUICK_RESPONSES = {
@@ -54,8 +67,8 @@ QUICK_RESPONSES = {
     ]
 }
 
-async def load_nlp_components():
-    """Load NLP components asynchronously"""
+def load_nlp_components():
+    """Bind the process-wide NLP engine (run as a background task, i.e. off the event loop)"""
     global response_generator, sentiment_analyzer, nlp_loading
     
     if response_generator and sentiment_analyzer:
@@ -66,11 +79,11 @@ async def load_nlp_components():
     
     nlp_loading = True
     try:
-        from ..nlp.response_generator import ResponseGenerator
-        from ..nlp.sentiment_analyzer import SentimentAnalyzer
-        
-        response_generator = ResponseGenerator()
-        sentiment_analyzer = SentimentAnalyzer()
+        from ..nlp import engine
+
+        # Shared with the generator: one analyzer per process
+        response_generator = engine.get_response_generator()
+        sentiment_analyzer = engine.get_sentiment_analyzer()
         logger.info("NLP components loaded successfully")
         return True
     except Exception as e:
@@ -84,6 +97,21 @@ def get_cached_response_key(message: str) -> str:
     """Generate cache key for message"""
     return hashlib.md5(message.lower().strip().encode()).hexdigest()
 
+def is_crisis_message(message: str) -> bool:
+    """Cheap keyword crisis check used before any admission decision"""
+    message_lower = message.lower()
+    return any(keyword in message_lower for keyword in CRISIS_KEYWORDS)
+
+def apply_crisis_indicators(message: str, response: Dict) -> Dict:
+    """Escalate a quick response using the analyzer's crisis scan when NLP is loaded"""
+    if sentiment_analyzer and not response["should_escalate"]:
+        crisis = sentiment_analyzer.detect_crisis_indicators(message)
+        if crisis["risk_level"] in ("medium", "high"):
+            response["crisis_level"] = crisis["risk_level"]
+            response["should_escalate"] = True
+            response["suggested_actions"] = ["priority_session", "counsellor_match"]
+    return response
+
 def get_quick_response(message: str) -> Dict:
     """Provide fast response using pattern matching"""
     import random
@@ -91,8 +119,7 @@ def get_quick_response(message: str) -> Dict:
     message_lower = message.lower().strip()
     
     # Crisis detection (high priority)
-    crisis_keywords = ['suicide', 'kill myself', 'end it all', 'hurt myself', 'want to die', 'no point']
-    if any(keyword in message_lower for keyword in crisis_keywords):
+    if is_crisis_message(message_lower):
         return {
             "reply": random.choice(QUICK_RESPONSES["crisis"]),
             "sentiment": {"sentiment": "negative", "confidence": 0.9, "intensity": "high"},
@@ -170,9 +197,76 @@ def get_quick_response(message: str) -> Dict:
         "response_time": "fast"
     }
 
+CRISIS_RANK = {"low": 1, "medium": 2, "high": 3}
+
+def persist_exchanges(batch: List[Dict]):
+    """Store a batch of bot exchanges in one transaction (runs on the writer thread).
+
+    Exchanges tied to a session are appended to its transcript, and the session's
+    meta gets the latest specific category and the highest crisis level seen, so
+    the waiting room can prioritise escalations.
+    """
+    conn = get_db_conn()
+    cur = conn.cursor()
+    try:
+        # take the write lock before reading meta: writers in other workers must
+        # not read the same old meta and overwrite a higher crisis level
+        cur.execute("BEGIN IMMEDIATE")
+        session_ids = list({item["session_id"] for item in batch if item.get("session_id")})
+        metas = {}
+        if session_ids:
+            cur.execute(
+                f"SELECT session_id, meta FROM sessions WHERE session_id IN ({','.join('?' * len(session_ids))})",
+                session_ids
+            )
+            metas = {row[0]: json.loads(row[1]) if row[1] else {} for row in cur.fetchall()}
+
+        rows = []
+        for item in batch:
+            analytics.record_event(cur, "bot_result", item["category"], item["crisis_level"])
+            if item["should_escalate"]:
+                analytics.record_event(cur, "escalation", item["category"], item["crisis_level"])
+            meta = metas.get(item.get("session_id"))
+            if meta is None:
+                continue
+            labels = (item["sentiment"], item["crisis_level"], item["category"])
+            rows.append((item["session_id"], "counselee", item["message"]) + labels)
+            rows.append((item["session_id"], "bot", item["reply"]) + labels)
+            if item["category"] != "general" or "category" not in meta:
+                meta["category"] = item["category"]
+            if CRISIS_RANK.get(item["crisis_level"], 0) >= CRISIS_RANK.get(meta.get("crisis_level"), 0):
+                meta["crisis_level"] = item["crisis_level"]
+            meta["should_escalate"] = meta.get("should_escalate", False) or item["should_escalate"]
+
+        cur.executemany(
+            "INSERT INTO messages(session_id, sender, message, sentiment, crisis_level, category) VALUES (?,?,?,?,?,?)",
+            rows
+        )
+        cur.executemany("UPDATE sessions SET meta=? WHERE session_id=?", [(json.dumps(m), sid) for sid, m in metas.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+conversation_writer = BatchingWriter(persist_exchanges, name="chatbot-persistence")
+
 @router.post("/query")
 async def query_bot(payload: BotQuery, background_tasks: BackgroundTasks):
     """Fast chatbot with optional NLP enhancement"""
+    response = await answer_query(payload, background_tasks)
+    if (payload.message or "").strip():
+        # Persistence and rollups are queued; the reply never waits on the DB
+        conversation_writer.submit({
+            "session_id": payload.session_id,
+            "message": payload.message,
+            "reply": response["reply"],
+            "sentiment": response["sentiment"].get("sentiment"),
+            "category": response["category"],
+            "crisis_level": response["crisis_level"],
+            "should_escalate": response["should_escalate"],
+        })
+    return response
+
+async def answer_query(payload: BotQuery, background_tasks: BackgroundTasks) -> Dict:
     start_time = time.time()
     
     try:
@@ -190,43 +284,74 @@ async def query_bot(payload: BotQuery, background_tasks: BackgroundTasks):
             }
         
         # Check cache first
-        cache_key = get_cached_response_key(user_message)
-        if cache_key in response_cache:
-            cached_response = response_cache[cache_key].copy()
+        with stage("cache"):
+            cache_key = get_cached_response_key(user_message)
+            cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            cached_response = cached_response.copy()
             cached_response["response_time"] = "cached"
             return cached_response
         
+        decision = admission_controller.admit()
+        if decision == admission.REJECT:
+            # Too many queries in flight or queued too long: shed load, but never
+            # drop a crisis message
+            # (same substring scans as the degraded path, no NLP model work)
+            crisis_response = apply_crisis_indicators(user_message, get_quick_response(user_message))
+            if not crisis_response["should_escalate"]:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Chatbot is busy, please retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+            crisis_response["response_time"] = "shed_crisis"
+            return crisis_response
+
         # Always provide fast response first
         quick_response = get_quick_response(user_message)
-        
+
+        if decision == admission.USE_QUICK:
+            # Degraded mode: skip the NLP pipeline and don't cache the reduced reply
+            with stage("nlp"):
+                quick_response = apply_crisis_indicators(user_message, quick_response)
+            quick_response["response_time"] = f"degraded_{time.time() - start_time:.3f}s"
+            return quick_response
+
         # Try to use NLP if available, but don't wait for it
         if response_generator and sentiment_analyzer:
             try:
-                # Set a timeout for NLP processing
+                # Run off the event loop so in-flight NLP work is observable and bounded
                 nlp_start = time.time()
-                response_data = response_generator.generate_response(user_message)
+                admission_controller.nlp_started()
+                try:
+                    with stage("nlp"):
+                        response_data = await run_in_threadpool(response_generator.generate_response, user_message)
+                finally:
+                    admission_controller.nlp_finished(time.time() - nlp_start)
                 nlp_time = time.time() - nlp_start
-                
+
                 if nlp_time < 2.0:  # Only use NLP if it's fast enough
+                    with stage("nlp"):
+                        keywords = sentiment_analyzer.extract_keywords(user_message)
                     response_data.update({
                         "reply": response_data["message"],
                         "nlp_available": True,
-                        "keywords": sentiment_analyzer.extract_keywords(user_message),
+                        "keywords": keywords,
                         "response_time": f"nlp_{nlp_time:.2f}s"
                     })
-                    
+
                     # Cache the response
                     response_cache[cache_key] = response_data.copy()
                     if len(response_cache) > 100:  # Limit cache size
                         response_cache.clear()
-                    
+
                     return response_data
                 else:
                     logger.warning(f"NLP too slow ({nlp_time:.2f}s), using quick response")
-                    
+
             except Exception as e:
                 logger.error(f"NLP processing failed: {e}")
-        
+
         # Load NLP in background for future requests
         if not response_generator or not sentiment_analyzer:
             background_tasks.add_task(load_nlp_components)
@@ -240,7 +365,9 @@ async def query_bot(payload: BotQuery, background_tasks: BackgroundTasks):
         quick_response["response_time"] = f"fast_{response_time:.3f}s"
         
         return quick_response
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Chatbot query failed: {e}")
         return {
@@ -260,6 +387,9 @@ def chatbot_health():
     return {
         "status": "ok",
         "nlp_status": nlp_status,
+        "mode": admission_controller.mode,
+        "admission": admission_controller.snapshot(),
+        "persistence": conversation_writer.metrics(),
         "features": {
             "sentiment_analysis": nlp_status == "available",
             "crisis_detection": nlp_status == "available",
@@ -277,10 +407,11 @@ def analyze_text(payload: BotQuery):
     try:
         user_message = payload.message or ""
         
-        sentiment = sentiment_analyzer.analyze_sentiment(user_message)
-        crisis = sentiment_analyzer.detect_crisis_indicators(user_message)
-        category = sentiment_analyzer.categorize_concern(user_message)
-        keywords = sentiment_analyzer.extract_keywords(user_message)
+        with stage("nlp"):
+            sentiment = sentiment_analyzer.analyze_sentiment(user_message)
+            crisis = sentiment_analyzer.detect_crisis_indicators(user_message)
+            category = sentiment_analyzer.categorize_concern(user_message)
+            keywords = sentiment_analyzer.extract_keywords(user_message)
         
         return {
             "message": user_message,
@@ -294,3 +425,56 @@ def analyze_text(payload: BotQuery):
     except Exception as e:
         logger.error(f"Text analysis failed: {e}")
         raise HTTPException(status_code=500, detail="Analysis service temporarily unavailable")
+
+
+BATCH_MAX_MESSAGES = 100000
+
+def _batch_results(options: BatchAnalyzeRequest):
+    """NDJSON lines for a batch request; runs in the threadpool while the pool scores chunks"""
+    from ..nlp import batch
+
+    if options.messages is not None:
+        chunks = batch.analyze_stream(enumerate(options.messages), options.chunk_size)
+        results, key_name = (r for chunk in chunks for r in chunk), "index"
+    else:
+        results = batch.score_messages(options.from_id or 1, options.to_id, options.write_back, options.chunk_size)
+        key_name = "id"
+    for result in results:
+        result[key_name] = result.pop("key")
+        yield json.dumps(result) + "\n"
+
+@router.post("/analyze/batch")
+async def analyze_batch(request: Request):
+    """Score many messages across a process pool, streaming NDJSON results in input order.
+
+    Accepts a JSON array / NDJSON stream of messages (strings or {"message": ...}),
+    or {"from_id", "to_id", "write_back"} to re-score stored rows.
+    """
+    content_type = request.headers.get("content-type", "")
+    body = None
+    if "ndjson" not in content_type and "jsonlines" not in content_type:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or NDJSON")
+
+    if body is None or isinstance(body, list):
+        records = body if body is not None else await read_records(request, BATCH_MAX_MESSAGES)
+        # coerce like a bare string record: null -> "", numbers -> their text
+        messages = [str((r.get("message") if isinstance(r, dict) else r) or "") for r in records]
+        options = BatchAnalyzeRequest(messages=messages)
+    else:
+        try:
+            options = BatchAnalyzeRequest.model_validate(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+        if options.messages is None and options.from_id is None and options.to_id is None:
+            raise HTTPException(status_code=400, detail="Provide messages or a from_id/to_id range")
+
+    if options.messages is not None and len(options.messages) > BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_MESSAGES} inline messages per request")
+    if options.messages is not None and options.write_back:
+        raise HTTPException(status_code=400, detail="write_back is only supported for message id ranges")
+    options.chunk_size = max(1, min(options.chunk_size, 5000))
+
+    return StreamingResponse(_batch_results(options), media_type="application/x-ndjson")
@@ -1,10 +1,17 @@
 # Routes for anonymous counselees
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+from ..utils.timing import TimedRoute
 from ..utils.db import get_db_conn
+from ..utils import analytics
+from ..utils.http_cache import make_etag, is_not_modified, not_modified
+from ..utils.dedup import RecentIds
 from ..models import SessionCreateResponse
-import secrets, json, time
+import secrets, json, sqlite3, time
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# client message ids sent recently, so retried sends skip the database
+recent_messages = RecentIds()
 
 @router.post("/session/start", response_model=SessionCreateResponse)
 def start_session():
@@ -14,6 +21,7 @@ def start_session():
     conn = get_db_conn()
     cur = conn.cursor()
     cur.execute("INSERT INTO sessions(session_id,created_at,meta) VALUES (?,?,?)", (session_id, int(time.time()), json.dumps({})))
+    analytics.record_event(cur, "session_started")
     conn.commit()
     conn.close()
     return SessionCreateResponse(session_id=session_id)
@@ -30,7 +38,16 @@ def get_session(session_id: str):
     return {"found": True, "session_id": row[0], "created_at": row[1]}
 
 @router.post("/session/{session_id}/message")
-def send_message(session_id: str, payload: dict):
+def send_message(session_id: str, payload: dict, request: Request):
+    # Retries carrying the same client_message_id (or Idempotency-Key header)
+    # get the original message back instead of a second row
+    client_id = payload.get("client_message_id") or request.headers.get("idempotency-key")
+    if client_id is not None:
+        client_id = str(client_id)[:128]
+        sent = recent_messages.get(session_id, client_id)
+        if sent:
+            return {**sent, "duplicate": True}
+
     conn = get_db_conn()
     cur = conn.cursor()
     # Verify session exists
@@ -39,21 +56,55 @@ def send_message(session_id: str, payload: dict):
         conn.close()
         return {"error": "Session not found"}
     
-    # Store message
-    cur.execute(
-        "INSERT INTO messages(session_id, sender, message) VALUES (?,?,?)",
-        (session_id, "counselee", payload.get("message", ""))
-    )
+    # Store message; ts is set here so replies and later replays echo the stored value
+    ts = int(time.time())
+    try:
+        cur.execute(
+            "INSERT INTO messages(session_id, sender, message, ts, client_message_id) VALUES (?,?,?,?,?)",
+            (session_id, "counselee", payload.get("message", ""), ts, client_id)
+        )
+    except sqlite3.IntegrityError:
+        # sent before, but no longer (or never, in this worker) in the recent window
+        conn.rollback()
+        cur.execute(
+            "SELECT id, message, ts FROM messages WHERE session_id=? AND client_message_id=?",
+            (session_id, client_id)
+        )
+        row = cur.fetchone()
+        conn.close()
+        sent = _sent_result(row[0], row[1], row[2], client_id)
+        recent_messages.put(session_id, client_id, sent)
+        return {**sent, "duplicate": True}
+    message_id = cur.lastrowid
+    analytics.record_event(cur, "message")
     conn.commit()
     conn.close()
-    return {"status": "sent"}
+    sent = _sent_result(message_id, payload.get("message", ""), ts, client_id)
+    if client_id is not None:
+        recent_messages.put(session_id, client_id, sent)
+    return {**sent, "duplicate": False}
+
+def _sent_result(message_id: int, message: str, ts: int, client_id) -> dict:
+    return {
+        "status": "sent",
+        "message_id": message_id,
+        "client_message_id": client_id,
+        "message": message,
+        "timestamp": ts,
+    }
 
 @router.get("/session/{session_id}/messages")
-def get_messages(session_id: str):
+def get_messages(session_id: str, request: Request, response: Response):
     conn = get_db_conn()
     cur = conn.cursor()
+    # Messages are append-only, so the newest id identifies the transcript version
+    cur.execute("SELECT MAX(id) FROM messages WHERE session_id=?", (session_id,))
+    etag = make_etag("m", cur.fetchone()[0] or 0)
+    if is_not_modified(request, etag):
+        conn.close()
+        return not_modified(etag)
     cur.execute(
-        "SELECT sender, message, ts FROM messages WHERE session_id=? ORDER BY ts ASC",
+        "SELECT sender, message, ts FROM messages WHERE session_id=? ORDER BY ts ASC, id ASC",
         (session_id,)
     )
     rows = cur.fetchall()
@@ -66,4 +117,6 @@ def get_messages(session_id: str):
             "message": row[1],
             "timestamp": row[2]
         })
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     return {"messages": messages}
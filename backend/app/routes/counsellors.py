@@ -1,10 +1,16 @@
 # Routes for counsellor registration and listing
-from fastapi import APIRouter, HTTPException
-from ..utils.db import get_db_conn
-from ..models import CounsellorCreate, Counsellor
-import json, time
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from ..utils.timing import TimedRoute
+from ..utils.db import get_db_conn, bump_revision, get_revision
+from ..utils import analytics
+from ..utils.bulk import read_records
+from ..utils.http_cache import make_etag, is_not_modified, not_modified
+from ..models import CounsellorCreate, Counsellor, CounsellorStatusBatch
+import json, sqlite3, time
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/register", response_model=Counsellor)
 def register_counsellor(payload: CounsellorCreate):
@@ -15,6 +21,7 @@ def register_counsellor(payload: CounsellorCreate):
         "INSERT INTO counsellors(display_name,categories,languages,bio,status) VALUES (?,?,?,?,?)",
         (payload.display_name, json.dumps(payload.categories), json.dumps(payload.languages), payload.bio or "", "pending")
     )
+    bump_revision(cur, "counsellors")
     conn.commit()
     cid = cur.lastrowid
     cur.execute("SELECT id,display_name,categories,languages,bio,status FROM counsellors WHERE id=?", (cid,))
@@ -32,9 +39,14 @@ def register_counsellor(payload: CounsellorCreate):
     )
 
 @router.get("/", response_model=list[Counsellor])
-def list_counsellors(status: str = "approved"):
+def list_counsellors(request: Request, response: Response, status: str = "approved"):
     conn = get_db_conn()
     cur = conn.cursor()
+    # Directory revision changes on every counsellor write; unchanged -> 304 without touching rows
+    etag = make_etag("c", get_revision(cur, "counsellors"))
+    if is_not_modified(request, etag):
+        conn.close()
+        return not_modified(etag)
     cur.execute("SELECT id,display_name,categories,languages,bio,status FROM counsellors WHERE status=?", (status,))
     rows = cur.fetchall()
     conn.close()
@@ -48,6 +60,8 @@ def list_counsellors(status: str = "approved"):
             bio=r[4],
             status=r[5]
         ))
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     return out
 
 @router.get("/sessions/available")
@@ -84,30 +98,122 @@ def accept_session(session_id: str, counsellor_id: int):
     cur = conn.cursor()
     
     # Check if session exists and is not already assigned
-    cur.execute("SELECT id FROM sessions WHERE session_id=?", (session_id,))
-    if not cur.fetchone():
+    cur.execute("SELECT created_at, meta FROM sessions WHERE session_id=?", (session_id,))
+    session = cur.fetchone()
+    if not session:
         conn.close()
         return {"error": "Session not found"}
     
-    # Create assignment table if it doesn't exist
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS session_assignments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT UNIQUE,
-            counsellor_id INTEGER,
-            assigned_at INTEGER DEFAULT (strftime('%s','now'))
-        )
-    """)
-    
     # Assign counsellor to session
     try:
         cur.execute(
             "INSERT INTO session_assignments(session_id, counsellor_id) VALUES (?,?)",
             (session_id, counsellor_id)
         )
+        meta = json.loads(session[1]) if session[1] else {}
+        analytics.record_wait(cur, int(time.time()) - session[0])
+        analytics.record_event(cur, "session_accepted", meta.get("category"), meta.get("crisis_level"))
         conn.commit()
         conn.close()
         return {"status": "accepted", "session_id": session_id}
-    except:
+    except sqlite3.IntegrityError:
         conn.close()
         return {"error": "Session already assigned"}
+
+# --- Bulk onboarding ---
+COUNSELLOR_STATUSES = {"pending", "approved", "rejected"}
+BULK_MAX_ROWS = 10000
+
+def _insert_counsellors(rows: list) -> list:
+    """Insert validated rows in one transaction; returns the new ids in input order"""
+    conn = get_db_conn()
+    cur = conn.cursor()
+    try:
+        # Take the write lock up front so AUTOINCREMENT ids are contiguous
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT seq FROM sqlite_sequence WHERE name='counsellors'")
+        row = cur.fetchone()
+        first_id = (row[0] if row else 0) + 1
+        cur.executemany(
+            "INSERT INTO counsellors(display_name,categories,languages,bio,status) VALUES (?,?,?,?,?)",
+            rows
+        )
+        bump_revision(cur, "counsellors")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return list(range(first_id, first_id + len(rows)))
+
+@router.post("/bulk")
+async def bulk_register_counsellors(request: Request):
+    """Register many counsellors (JSON array or NDJSON) in a single transaction.
+
+    Invalid records are reported per row and do not block the valid ones.
+    """
+    records = await read_records(request, BULK_MAX_ROWS)
+    if len(records) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} records per request")
+
+    results, rows, row_indexes = [], [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            results.append({"index": index, "result": "error", "errors": [{"loc": [], "msg": "Record must be a JSON object"}]})
+            continue
+        try:
+            payload = CounsellorCreate.model_validate(record)
+        except ValidationError as e:
+            errors = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            results.append({"index": index, "result": "error", "errors": errors})
+            continue
+        rows.append((payload.display_name, json.dumps(payload.categories), json.dumps(payload.languages), payload.bio or "", "pending"))
+        row_indexes.append(index)
+        results.append(None)
+
+    if rows:
+        ids = await run_in_threadpool(_insert_counsellors, rows)
+        for index, cid in zip(row_indexes, ids):
+            results[index] = {"index": index, "result": "created", "id": cid}
+
+    return {
+        "created": len(rows),
+        "failed": len(records) - len(rows),
+        "results": results
+    }
+
+@router.post("/status/batch")
+def batch_update_status(payload: CounsellorStatusBatch):
+    """Change the status of many counsellors in one transaction (e.g. bulk approval)"""
+    if payload.status not in COUNSELLOR_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status '{payload.status}'")
+    ids = list(dict.fromkeys(payload.ids))
+    conn = get_db_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        existing = set()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cur.execute(f"SELECT id FROM counsellors WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            existing.update(r[0] for r in cur.fetchall())
+        found = [cid for cid in ids if cid in existing]
+        cur.executemany("UPDATE counsellors SET status=? WHERE id=?", [(payload.status, cid) for cid in found])
+        if found:
+            bump_revision(cur, "counsellors")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {
+        "updated": len(found),
+        "results": [
+            {"id": cid, "result": "updated", "status": payload.status} if cid in existing
+            else {"id": cid, "result": "not_found"}
+            for cid in ids
+        ]
+    }
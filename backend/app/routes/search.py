@@ -0,0 +1,62 @@
+# Full-text search over session transcripts (SQLite FTS5)
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from ..utils.timing import TimedRoute
+from ..utils.db import get_db_conn
+from ..utils.search import build_match_query, backfill_status
+
+router = APIRouter(route_class=TimedRoute)
+
+@router.get("/messages")
+def search_messages(
+    q: str,
+    session_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """Ranked message hits with highlighted snippets, best matches first"""
+    match = build_match_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Query must contain at least one word")
+
+    sql = """
+        SELECT m.id, m.session_id, m.sender, m.ts,
+               snippet(messages_fts, 0, '[', ']', '…', 12),
+               bm25(messages_fts) AS rank
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        WHERE messages_fts MATCH ?
+    """
+    params = [match]
+    if session_id:
+        sql += " AND m.session_id = ?"
+        params.append(session_id)
+    # Fetch one extra row to know whether another page exists
+    sql += " ORDER BY rank LIMIT ? OFFSET ?"
+    params += [limit + 1, offset]
+
+    conn = get_db_conn()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    status = backfill_status(conn)
+    conn.close()
+
+    return {
+        "query": q,
+        "results": [
+            {
+                "message_id": r[0],
+                "session_id": r[1],
+                "sender": r[2],
+                "timestamp": r[3],
+                "snippet": r[4],
+                "score": round(-r[5], 4)  # bm25 is lower-is-better
+            }
+            for r in rows[:limit]
+        ],
+        "has_more": len(rows) > limit,
+        "next_offset": offset + limit if len(rows) > limit else None,
+        # Older transcripts are still being indexed
+        "index_complete": not status["pending"]
+    }
@@ -0,0 +1,150 @@
+# Pre-forking server launcher.
+#
+# The master imports the app and builds the NLP engine once, freezes the GC so
+# that shared objects are not touched (and copied) by collections in the
+# children, then forks uvicorn workers that all accept on one shared socket.
+# Workers that die are respawned; failed starts back off and, after
+# MAX_RAPID_FAILURES in a row, stop the server.
+#
+# Run from backend/:
+#   python -m app.serve --workers 4 --port 8000
+#   python -m app.serve --workers 4 --no-preload   # each worker loads its own engine
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("luma.serve")
+
+
+def preload_app():
+    from .main import app
+    from .nlp import engine
+    from .routes import chatbot
+    engine.preload()
+    chatbot.load_nlp_components()
+    return app
+
+
+# a worker that exits sooner than this after being forked counts as a failed start
+MIN_UPTIME = 5.0
+MAX_RAPID_FAILURES = 5
+
+
+def run_worker(sock: socket.socket, args, app=None) -> bool:
+    """Serve until shutdown; False if the server never started (bind / lifespan failure)"""
+    if app is None:
+        app = preload_app()
+    config = uvicorn.Config(app, log_level=args.log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return server.started
+
+
+def init_worker(app):
+    """Per-worker setup after fork, for state that must not be shared with the master"""
+    if app is not None:
+        from .utils import db
+        db.reset_after_fork()
+
+
+def spawn(sock, args, app):
+    pid = os.fork()
+    if pid == 0:
+        # Default signal handling in the child; uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 1
+        try:
+            init_worker(app)
+            code = 0 if run_worker(sock, args, app) else 3
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} failed")
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forking Luma server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-preload", action="store_true", help="load app and NLP in each worker instead")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if os.environ.get("LUMA_DB_MODE") == "memory" and args.workers > 1:
+        # each worker would get its own private in-memory database
+        parser.error("LUMA_DB_MODE=memory requires --workers 1")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.set_inheritable(True)
+
+    app = None
+    if not args.no_preload:
+        start = time.perf_counter()
+        app = preload_app()
+        # Move everything allocated so far out of the collector's reach: child
+        # GC passes would otherwise write to these objects' headers and copy
+        # their pages.
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Preloaded app and NLP engine in {time.perf_counter() - start:.1f}s "
+                    f"({gc.get_freeze_count()} objects frozen)")
+
+    # pid -> fork time, to tell crashes after serving from failed starts
+    children = {spawn(sock, args, app): time.monotonic() for _ in range(args.workers)}
+    logger.info(f"Master {os.getpid()} started workers {sorted(children)}")
+    rapid_failures = 0
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if code != 0 and time.monotonic() - started < MIN_UPTIME:
+            rapid_failures += 1
+        else:
+            rapid_failures = 0
+        if rapid_failures >= MAX_RAPID_FAILURES:
+            logger.error(f"Worker {pid} exited ({code}); {rapid_failures} failed starts in a row, giving up")
+            stop(None, None)
+            continue
+        # back off between failed starts instead of fork-looping
+        delay = min(0.5 * 2 ** rapid_failures, 30.0) if rapid_failures else 0
+        logger.warning(f"Worker {pid} exited ({code}); respawning" + (f" in {delay:.1f}s" if delay else ""))
+        time.sleep(delay)
+        if not stopping:
+            children[spawn(sock, args, app)] = time.monotonic()
+    sys.exit(1 if rapid_failures >= MAX_RAPID_FAILURES else 0)
+
+
+if __name__ == "__main__":
+    main()
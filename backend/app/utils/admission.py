@@ -0,0 +1,169 @@
+# Adaptive admission control for the chatbot NLP path
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Modes reported by /api/chatbot/health
+NORMAL = "normal"
+DEGRADED = "degraded"
+SHEDDING = "shedding"
+
+# Decisions returned by AdmissionController.admit()
+USE_NLP = "nlp"
+USE_QUICK = "quick"
+REJECT = "reject"
+
+
+class AdmissionController:
+    """Tracks in-flight chatbot work, recent NLP latency and event-loop queueing.
+
+    - in-flight NLP calls >= soft_limit, or latency EWMA over budget -> quick responses
+    - queries in flight > hard_limit, or queue delay over max_queue_delay -> reject
+      (caller still runs crisis detection)
+
+    Queries are counted by InFlightMiddleware from arrival to the last response
+    byte. Quick replies never yield to the event loop, so under a burst the
+    backlog sits in the loop's ready queue rather than in the handler; the
+    queue delay (how overdue monitor_loop's timer is) measures that backlog.
+
+    While degraded on latency, one probe request per probe_interval is still sent
+    through NLP so the EWMA can recover. State is per process and only mutated
+    from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, soft_limit: int = 4, hard_limit: int = 32,
+                 latency_budget: float = 0.5, alpha: float = 0.2,
+                 probe_interval: float = 1.0, max_queue_delay: float = 0.25,
+                 monitor_interval: float = 0.05):
+        if hard_limit <= soft_limit + 1:
+            # the hard limit must leave room for the NLP slots plus queued quick replies
+            logger.warning(f"hard_limit {hard_limit} <= soft_limit + 1; using {soft_limit + 2}")
+            hard_limit = soft_limit + 2
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.latency_budget = latency_budget
+        self.alpha = alpha
+        self.probe_interval = probe_interval
+        self.max_queue_delay = max_queue_delay
+        self.monitor_interval = monitor_interval
+
+        self.in_flight = 0
+        self.nlp_in_flight = 0
+        self.latency_ewma = 0.0
+        self.last_nlp_at = 0.0
+        self.loop_lag = 0.0
+        self._lag_due = None
+        self._monitor = None
+        self.counters = {"nlp": 0, "degraded": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            soft_limit=int(os.environ.get("LUMA_NLP_SOFT_LIMIT", "4")),
+            hard_limit=int(os.environ.get("LUMA_QUERY_HARD_LIMIT", "32")),
+            latency_budget=float(os.environ.get("LUMA_NLP_LATENCY_BUDGET", "0.5")),
+            max_queue_delay=float(os.environ.get("LUMA_QUEUE_DELAY_LIMIT", "0.25")),
+        )
+
+    @property
+    def queue_delay(self) -> float:
+        """Seconds ready work waits for the event loop (0 while the monitor is not running)"""
+        if self._lag_due is None:
+            return 0.0
+        return max(self.loop_lag, time.monotonic() - self._lag_due)
+
+    def _overloaded(self) -> bool:
+        return self.in_flight > self.hard_limit or self.queue_delay > self.max_queue_delay
+
+    async def monitor_loop(self):
+        while True:
+            self._lag_due = time.monotonic() + self.monitor_interval
+            await asyncio.sleep(self.monitor_interval)
+            self.loop_lag = max(0.0, time.monotonic() - self._lag_due)
+
+    def start_monitor(self):
+        """Start sampling queue delay on the running event loop (per worker, from the lifespan)"""
+        if self._monitor is None:
+            self._monitor = asyncio.get_running_loop().create_task(self.monitor_loop())
+
+    def stop_monitor(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        self._lag_due = None
+        self.loop_lag = 0.0
+
+    @property
+    def mode(self) -> str:
+        if self.in_flight >= self.hard_limit or self.queue_delay > self.max_queue_delay:
+            return SHEDDING
+        if self.nlp_in_flight >= self.soft_limit or self.latency_ewma > self.latency_budget:
+            return DEGRADED
+        return NORMAL
+
+    def enter(self):
+        self.in_flight += 1
+
+    def leave(self):
+        self.in_flight -= 1
+
+    def admit(self) -> str:
+        """Decide how to serve the current query (counted by InFlightMiddleware)."""
+        if self._overloaded():
+            self.counters["rejected"] += 1
+            return REJECT
+        if self.nlp_in_flight >= self.soft_limit:
+            self.counters["degraded"] += 1
+            return USE_QUICK
+        if self.latency_ewma > self.latency_budget:
+            if time.monotonic() - self.last_nlp_at < self.probe_interval:
+                self.counters["degraded"] += 1
+                return USE_QUICK
+        self.counters["nlp"] += 1
+        return USE_NLP
+
+    def nlp_started(self):
+        self.nlp_in_flight += 1
+
+    def nlp_finished(self, elapsed: float):
+        self.nlp_in_flight -= 1
+        self.last_nlp_at = time.monotonic()
+        if self.latency_ewma == 0.0:
+            self.latency_ewma = elapsed
+        else:
+            self.latency_ewma = self.alpha * elapsed + (1 - self.alpha) * self.latency_ewma
+
+    def snapshot(self) -> dict:
+        return {
+            "mode": self.mode,
+            "in_flight": self.in_flight,
+            "queue_delay": round(self.queue_delay, 4),
+            "nlp_in_flight": self.nlp_in_flight,
+            "latency_ewma": round(self.latency_ewma, 4),
+            "soft_limit": self.soft_limit,
+            "hard_limit": self.hard_limit,
+            "latency_budget": self.latency_budget,
+            "max_queue_delay": self.max_queue_delay,
+            "counters": dict(self.counters),
+        }
+
+
+class InFlightMiddleware:
+    """Counts requests to `path` in controller.in_flight, from arrival to the last response byte"""
+
+    def __init__(self, app, controller: AdmissionController, path: str):
+        self.app = app
+        self.controller = controller
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.app(scope, receive, send)
+        self.controller.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.leave()
@@ -0,0 +1,41 @@
+# Incrementally maintained analytics rollups.
+#
+# Writers bump counters in the same transaction as the row they describe, so
+# dashboard reads only touch the (small, bounded) rollup tables and never scan
+# messages / sessions / session_assignments.
+import time
+
+# Upper bounds (seconds) of the wait-before-accept histogram buckets
+WAIT_BUCKETS = (30, 60, 120, 300, 600, 1800, 3600)
+OVERFLOW_BUCKET = "+Inf"
+
+
+def hour_bucket(ts: int) -> int:
+    return ts - ts % 3600
+
+
+def wait_bucket(wait_seconds: int) -> str:
+    for bound in WAIT_BUCKETS:
+        if wait_seconds <= bound:
+            return str(bound)
+    return OVERFLOW_BUCKET
+
+
+def record_event(cur, event: str, category: str = "general", crisis_level: str = "low", ts: int = None):
+    """Count one event in the hourly rollup (call inside the writing transaction)."""
+    cur.execute(
+        "INSERT INTO rollup_hourly(hour, event, category, crisis_level, count) VALUES (?,?,?,?,1) "
+        "ON CONFLICT(hour, event, category, crisis_level) DO UPDATE SET count = count + 1",
+        (hour_bucket(ts or int(time.time())), event, category or "general", crisis_level or "low")
+    )
+
+
+def record_wait(cur, wait_seconds: int):
+    """Add one accepted session to the wait-time histogram."""
+    wait_seconds = max(0, int(wait_seconds))
+    cur.execute(
+        "INSERT INTO rollup_wait_times(bucket, count, total_seconds) VALUES (?,1,?) "
+        "ON CONFLICT(bucket) DO UPDATE SET count = count + 1, total_seconds = total_seconds + excluded.total_seconds",
+        (wait_bucket(wait_seconds), wait_seconds)
+    )
+
@@ -0,0 +1,36 @@
+# Shared parsing for bulk endpoints that accept a JSON array or an NDJSON stream
+import json
+from fastapi import HTTPException, Request
+
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+async def read_records(request: Request, max_rows: int) -> list:
+    """Parse a JSON array body or an NDJSON stream into a list of raw records.
+
+    Unparseable NDJSON lines become None so callers can report them per row.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        records, buf = [], b""
+        async for chunk in request.stream():
+            buf += chunk
+            *lines, buf = buf.split(b"\n")
+            records.extend(_parse_ndjson_line(line) for line in lines if line.strip())
+            if len(records) > max_rows:
+                break
+        if buf.strip():
+            records.append(_parse_ndjson_line(buf))
+        return records
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    return body
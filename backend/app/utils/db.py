@@ -1,14 +1,242 @@
 # Database connection utility placeholder
+#
+# LUMA_DB_MODE=file (default) opens LUMA_DB_PATH directly. LUMA_DB_MODE=memory
+# keeps the whole database in RAM (memdb VFS, shared by all connections of one
+# process): it is restored from LUMA_DB_PATH at startup if that file exists and
+# snapshotted back to it every LUMA_SNAPSHOT_INTERVAL seconds and at shutdown.
+# Memory mode is for a single server process, enforced by a lock on
+# LUMA_DB_PATH.lock; a worker forked by app.serve reloads the last snapshot
+# (reset_after_fork) instead of the master's copy.
+#
+# Online backup of the file-backed database (from backend/):
+#   python -m app.utils.db backup /backups/luma-$(date +%F).sqlite3
+# In memory mode the snapshots at LUMA_DB_PATH are the backups.
+import argparse
+import logging
 import sqlite3
 import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .timing import timed
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = os.environ.get("LUMA_DB_PATH", "/data/luma.sqlite3")
+DB_MODE = os.environ.get("LUMA_DB_MODE", "file")
+MEMORY_URI = "file:/luma?vfs=memdb"
+SNAPSHOT_INTERVAL = float(os.environ.get("LUMA_SNAPSHOT_INTERVAL", "60"))
+BACKUP_PAGES = int(os.environ.get("LUMA_BACKUP_PAGES", "256"))
+BACKUP_STAGE_MAX_MB = int(os.environ.get("LUMA_BACKUP_STAGE_MAX_MB", "256"))
+
+# memdb frees the database when its last connection closes; this one never does
+_memory_anchor = None
+# anchors inherited through fork(): never used or closed in the child
+_inherited_anchors = []
+# exclusive lock on DB_PATH.lock while this process (and its forks) serve it from memory
+_memory_lock = None
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that adds statement and fetch time to the request's "db" stage"""
+
+    def execute(self, *args):
+        return timed("db", super().execute, *args)
+
+    def executemany(self, *args):
+        return timed("db", super().executemany, *args)
+
+    def fetchone(self):
+        return timed("db", super().fetchone)
+
+    def fetchall(self):
+        return timed("db", super().fetchall)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def commit(self):
+        return timed("db", super().commit)
+
 
 def get_db_conn():
+    if DB_MODE == "memory":
+        _ensure_memory_db()
+        return sqlite3.connect(MEMORY_URI, uri=True, check_same_thread=False, factory=TimedConnection)
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=TimedConnection)
     return conn
 
+def _ensure_memory_db():
+    global _memory_anchor
+    if _memory_anchor is not None:
+        return
+    _lock_memory_db()
+    anchor = sqlite3.connect(MEMORY_URI, uri=True, check_same_thread=False)
+    if os.path.exists(DB_PATH):
+        # Restore the last snapshot into RAM
+        disk = sqlite3.connect(DB_PATH)
+        disk.backup(anchor)
+        disk.close()
+        logger.info(f"Loaded {DB_PATH} into memory")
+    _memory_anchor = anchor
+
+def _lock_memory_db():
+    """Fail if another process already serves DB_PATH from memory.
+
+    Two memdb copies (e.g. uvicorn --workers 2) would snapshot over each
+    other's data. Forked children share the parent's lock.
+    """
+    global _memory_lock
+    if _memory_lock is not None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    lock_file = open(f"{DB_PATH}.lock", "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        raise RuntimeError(
+            f"{DB_PATH} is already served from memory by another process; "
+            "LUMA_DB_MODE=memory supports a single server process"
+        )
+    _memory_lock = lock_file
+
+def reset_after_fork():
+    """Give a forked worker its own in-memory database, restored from DB_PATH.
+
+    The inherited memdb is the parent's copy from startup, older than any
+    snapshot a previous worker wrote, and SQLite connections must not be used
+    across fork(). The inherited anchor is left untouched and the worker loads
+    the last snapshot into a memdb under its own name.
+    """
+    global _memory_anchor, MEMORY_URI
+    if DB_MODE != "memory":
+        return
+    if _memory_anchor is not None:
+        _inherited_anchors.append(_memory_anchor)
+        _memory_anchor = None
+    MEMORY_URI = f"file:/luma-{os.getpid()}?vfs=memdb"
+    init_db()
+
+def backup_database(dest_path: str, pages: int = BACKUP_PAGES, sleep: float = 0.005,
+                    max_restarts: int = 3, staged: bool = None) -> dict:
+    """Consistent online copy of the live database to dest_path.
+
+    staged: copy the database into a private in-memory database in one step
+    (writers wait for one fast memory copy, never for disk I/O), then write
+    that copy to disk in `pages`-sized steps. Used for memory mode and for file
+    databases up to LUMA_BACKUP_STAGE_MAX_MB.
+
+    Otherwise the live database is copied in `pages`-sized steps with `sleep`
+    between them. A write by another connection restarts that copy; after
+    max_restarts it finishes in one step rather than chasing a busy database.
+
+    The copy is written to a temporary file and atomically renamed.
+    """
+    if staged is None:
+        staged = DB_MODE == "memory" or (
+            os.path.exists(DB_PATH) and os.path.getsize(DB_PATH) <= BACKUP_STAGE_MAX_MB * 1024 * 1024
+        )
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp"
+    progress = {"steps": 0, "restarts": 0, "remaining": None}
+
+    def on_progress(status, remaining, total):
+        progress["steps"] += 1
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+        progress["remaining"] = remaining
+        if progress["restarts"] >= max_restarts:
+            raise _BackupRestarted()
+
+    start = time.perf_counter()
+    lock_seconds = None
+    source = get_db_conn()
+    try:
+        dest = sqlite3.connect(tmp_path)
+        try:
+            if staged:
+                staging = sqlite3.connect(":memory:")
+                t0 = time.perf_counter()
+                source.backup(staging, pages=-1)
+                lock_seconds = time.perf_counter() - t0
+                staging.backup(dest, pages=pages, sleep=sleep)
+                staging.close()
+            else:
+                try:
+                    source.backup(dest, pages=pages, progress=on_progress, sleep=sleep)
+                except _BackupRestarted:
+                    source.backup(dest, pages=-1)
+        finally:
+            dest.close()
+        os.replace(tmp_path, dest_path)
+    finally:
+        source.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {
+        "path": dest_path,
+        "staged": staged,
+        "seconds": round(time.perf_counter() - start, 3),
+        "lock_seconds": round(lock_seconds, 3) if lock_seconds is not None else None,
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+    }
+
+class _BackupRestarted(Exception):
+    pass
+
+class Snapshotter:
+    """Periodically persists the in-memory database to LUMA_DB_PATH"""
+
+    def __init__(self, interval: float = SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_snapshot = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="db-snapshot", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.snapshot()
+
+    def snapshot(self):
+        try:
+            self.last_snapshot = backup_database(DB_PATH)
+        except Exception as e:
+            logger.error(f"Snapshot to {DB_PATH} failed: {e}")
+
+    def stop(self):
+        """Stop the timer and write a final snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.snapshot()
+
+snapshotter = Snapshotter() if DB_MODE == "memory" else None
+
 def init_db():
     conn = get_db_conn()
     cur = conn.cursor()
@@ -41,6 +269,142 @@ def init_db():
         ts INTEGER DEFAULT (strftime('%s','now'))
     )
     """)
+    # analysis results, filled by the batch scorer (nlp/batch.py)
+    _ensure_column(cur, "messages", "sentiment", "TEXT")
+    _ensure_column(cur, "messages", "crisis_level", "TEXT")
+    _ensure_column(cur, "messages", "category", "TEXT")
+    # idempotency key supplied by the client; one row per (session, key)
+    _ensure_column(cur, "messages", "client_message_id", "TEXT")
+    # transcript polling reads the newest message id per session
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id, id)")
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_client_id
+    ON messages(session_id, client_message_id) WHERE client_message_id IS NOT NULL
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS session_assignments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT UNIQUE,
+        counsellor_id INTEGER,
+        assigned_at INTEGER DEFAULT (strftime('%s','now'))
+    )
+    """)
+    # rollups: maintained incrementally by the writers (see utils/analytics.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS rollup_hourly (
+        hour INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        category TEXT NOT NULL,
+        crisis_level TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hour, event, category, crisis_level)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS rollup_wait_times (
+        bucket TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0,
+        total_seconds INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    # revisions: monotonically increasing counters used to build ETags
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS revisions (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    """)
     conn.commit()
+    init_fts(conn)
     conn.close()
 
+def _ensure_column(cur, table: str, column: str, decl: str):
+    """Add a column to an existing table if an older database lacks it"""
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def init_fts(conn):
+    """Create the FTS5 index over messages.message and its sync triggers.
+
+    The index is external-content (it stores no copy of the text). Rows that
+    existed before the index was created are indexed by the chunked backfill in
+    utils/search.py: ids <= fts_backfill.last_id or > target_id are indexed, the
+    range in between is still pending, and the update/delete triggers skip it.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS fts_backfill (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        target_id INTEGER NOT NULL
+    )
+    """)
+    # Triggers and the backfill watermark must be set up atomically
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT 1 FROM sqlite_master WHERE name='messages_fts'")
+        if not cur.fetchone():
+            cur.execute("""
+            CREATE VIRTUAL TABLE messages_fts USING fts5(
+                message, content='messages', content_rowid='id', tokenize='porter unicode61'
+            )
+            """)
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM messages")
+            cur.execute(
+                "INSERT OR REPLACE INTO fts_backfill(name, last_id, target_id) VALUES ('messages_fts', 0, ?)",
+                (cur.fetchone()[0],)
+            )
+        indexed = """(old.id > (SELECT target_id FROM fts_backfill WHERE name='messages_fts')
+                   OR old.id <= (SELECT last_id FROM fts_backfill WHERE name='messages_fts'))"""
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, message) VALUES (new.id, new.message);
+        END
+        """)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages WHEN {indexed} BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        END
+        """)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF message ON messages WHEN {indexed} BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            INSERT INTO messages_fts(rowid, message) VALUES (new.id, new.message);
+        END
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def bump_revision(cur, name: str):
+    """Increment a named revision counter (call inside the writing transaction)."""
+    cur.execute(
+        "INSERT INTO revisions(name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,)
+    )
+
+def get_revision(cur, name: str) -> int:
+    cur.execute("SELECT value FROM revisions WHERE name=?", (name,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backup = sub.add_parser("backup", help="online backup of LUMA_DB_PATH without stopping writers")
+    backup.add_argument("dest")
+    backup.add_argument("--pages", type=int, default=BACKUP_PAGES, help="pages copied per step (-1: all at once)")
+    backup.add_argument("--staged", action="store_true", default=None, help="always stage the copy in memory")
+    backup.add_argument("--no-staged", dest="staged", action="store_false", help="copy the live database in steps")
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        if DB_MODE == "memory":
+            # this process would only see the last snapshot, not the server's RAM
+            parser.error("backup is for LUMA_DB_MODE=file; in memory mode LUMA_DB_PATH holds the snapshots")
+        print(backup_database(args.dest, pages=args.pages, staged=args.staged))
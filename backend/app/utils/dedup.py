@@ -0,0 +1,55 @@
+# Recently seen client message ids, for idempotent message sends
+#
+# A retried send is answered from this window without touching the database.
+# The window is per process and short-lived; the unique index on
+# messages(session_id, client_message_id) is what guarantees one row per id.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+DEDUP_TTL = float(os.environ.get("LUMA_DEDUP_TTL", "300"))
+DEDUP_PER_SESSION = 64
+DEDUP_MAX_SESSIONS = 10000
+
+
+class RecentIds:
+    """Bounded per-session map of client id -> stored result, with expiry"""
+
+    def __init__(self, ttl: float = DEDUP_TTL, per_session: int = DEDUP_PER_SESSION,
+                 max_sessions: int = DEDUP_MAX_SESSIONS):
+        self.ttl = ttl
+        self.per_session = per_session
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, client_id: str) -> Optional[dict]:
+        with self._lock:
+            ids = self._sessions.get(session_id)
+            if not ids or client_id not in ids:
+                return None
+            expires, result = ids[client_id]
+            if expires < time.monotonic():
+                del ids[client_id]
+                return None
+            return result
+
+    def put(self, session_id: str, client_id: str, result: dict):
+        with self._lock:
+            ids = self._sessions.get(session_id)
+            if ids is None:
+                ids = self._sessions[session_id] = OrderedDict()
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            ids[client_id] = (time.monotonic() + self.ttl, result)
+            ids.move_to_end(client_id)
+            while len(ids) > self.per_session:
+                ids.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
@@ -0,0 +1,27 @@
+# Helpers for ETag / conditional GET handling
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from version parts (weak so gzip re-encoding keeps it valid)."""
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match matches etag (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = _strip_weak(etag)
+    return any(_strip_weak(candidate) == current for candidate in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
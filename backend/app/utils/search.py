@@ -0,0 +1,109 @@
+# Full-text search helpers and the FTS5 backfill job.
+#
+# Backfill from the command line (from backend/):
+#   python -m app.utils.search --chunk-size 2000
+import argparse
+import logging
+import re
+import threading
+import time
+from typing import Optional
+
+from .db import get_db_conn
+
+logger = logging.getLogger(__name__)
+
+_TERM_RE = re.compile(r'(\w+)(\*?)')
+
+
+def build_match_query(text: str) -> str:
+    """Turn free text into a safe FTS5 MATCH expression (AND of quoted terms, `word*` = prefix)"""
+    terms = [f'"{word}"{star}' for word, star in _TERM_RE.findall(text)]
+    return " ".join(terms)
+
+
+def backfill_status(conn) -> dict:
+    cur = conn.cursor()
+    cur.execute("SELECT last_id, target_id FROM fts_backfill WHERE name='messages_fts'")
+    row = cur.fetchone()
+    if not row:
+        return {"pending": False, "last_id": 0, "target_id": 0}
+    return {"pending": row[0] < row[1], "last_id": row[0], "target_id": row[1]}
+
+
+def backfill_chunk(conn, chunk_size: int) -> Optional[int]:
+    """Index the next chunk of pre-existing messages; returns rows indexed, None when done.
+
+    Each chunk is its own short write transaction, and the watermark is read and
+    advanced under the same lock, so concurrent runners never index a row twice.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT last_id, target_id FROM fts_backfill WHERE name='messages_fts'")
+        row = cur.fetchone()
+        if not row or row[0] >= row[1]:
+            conn.rollback()
+            return None
+        last_id, target_id = row
+        upper = min(last_id + chunk_size, target_id)
+        cur.execute(
+            "INSERT INTO messages_fts(rowid, message) "
+            "SELECT id, message FROM messages WHERE id > ? AND id <= ?",
+            (last_id, upper)
+        )
+        indexed = cur.rowcount
+        cur.execute("UPDATE fts_backfill SET last_id=? WHERE name='messages_fts'", (upper,))
+        conn.commit()
+        return indexed
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def backfill_fts(chunk_size: int = 250, pause: float = 0.01) -> int:
+    """Index all pre-existing messages in chunks, yielding the write lock between chunks"""
+    conn = get_db_conn()
+    total = 0
+    try:
+        while (indexed := backfill_chunk(conn, chunk_size)) is not None:
+            total += indexed
+            time.sleep(pause)
+    finally:
+        conn.close()
+    return total
+
+
+def start_backfill_if_pending():
+    """Run the backfill in a daemon thread if the index is missing older rows"""
+    conn = get_db_conn()
+    try:
+        pending = backfill_status(conn)["pending"]
+    finally:
+        conn.close()
+    if not pending:
+        return None
+
+    def run():
+        try:
+            total = backfill_fts()
+            logger.info(f"FTS backfill complete: {total} messages indexed")
+        except Exception as e:
+            logger.error(f"FTS backfill failed: {e}")
+
+    thread = threading.Thread(target=run, name="fts-backfill", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index pre-existing messages into messages_fts")
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--pause", type=float, default=0.01, help="seconds to sleep between chunks")
+    args = parser.parse_args()
+
+    from .db import init_db
+    init_db()
+    start = time.perf_counter()
+    total = backfill_fts(args.chunk_size, args.pause)
+    print(f"indexed {total} messages in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,101 @@
+# Bounded in-process queue drained by a batching writer thread.
+#
+# submit() never blocks: when the queue is full the item is dropped and
+# counted, so request handlers can hand off post-response work (DB writes)
+# without ever waiting on SQLite.
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingWriter:
+    def __init__(self, write_batch: Callable[[List[dict]], None], name: str,
+                 maxsize: int = 10000, batch_size: int = 200, flush_interval: float = 0.05):
+        self.write_batch = write_batch
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.counters = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self.last_batch = {"size": 0, "write_ms": 0.0}
+
+    def submit(self, item: dict) -> bool:
+        """Enqueue without blocking; returns False if the item was dropped"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.counters["dropped"] += 1
+            return False
+        self.counters["enqueued"] += 1
+        return True
+
+    def _ensure_started(self):
+        # Started lazily in the serving process (never in a pre-forking master)
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Collect whatever else arrives within the flush window, up to batch_size
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            start = time.perf_counter()
+            try:
+                self.write_batch(batch)
+                self.counters["written"] += len(batch)
+            except Exception as e:
+                self.counters["failed"] += len(batch)
+                logger.error(f"{self.name}: failed to write batch of {len(batch)}: {e}")
+            finally:
+                self.counters["batches"] += 1
+                self.last_batch = {"size": len(batch), "write_ms": round((time.perf_counter() - start) * 1000, 2)}
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything submitted so far has been written (or timeout)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Drain the queue and stop the writer thread (called on shutdown)"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "running": bool(self._thread and self._thread.is_alive()),
+            **self.counters,
+            "last_batch": self.last_batch,
+        }
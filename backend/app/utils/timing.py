@@ -0,0 +1,200 @@
+# Per-request stage timing, Server-Timing headers and structured access logs.
+#
+# TimingMiddleware opens a timing record for each request. Code on the request
+# path adds to it with `with stage("nlp"): ...`; DB time is collected by the
+# connection factory in utils/db.py, and `serialize` is the time between the
+# endpoint returning (marked by TimedRoute) and the response headers going out.
+# One JSON access-log line per request is handed to a QueueHandler, so the
+# request never waits on log I/O.
+import asyncio
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+
+STAGES = ("db", "cache", "nlp", "serialize")
+
+_current: ContextVar[Optional[dict]] = ContextVar("luma_request_timing", default=None)
+
+access_logger = logging.getLogger("luma.access")
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+
+def add_stage(name: str, seconds: float):
+    timing = _current.get()
+    if timing is not None:
+        timing[name] = timing.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing[name] = timing.get(name, 0.0) + time.perf_counter() - start
+
+
+def timed(name: str, fn, *args, **kwargs):
+    """Call fn inside a stage; cheap no-op wrapper outside a request"""
+    timing = _current.get()
+    if timing is None:
+        return fn(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timing[name] = timing.get(name, 0.0) + time.perf_counter() - start
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that marks when the endpoint function returns"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # routes copied by include_router must not be wrapped twice
+        endpoint = getattr(endpoint, "__timed_endpoint__", endpoint)
+
+        def mark_end():
+            timing = _current.get()
+            if timing is not None:
+                timing["_endpoint_end"] = time.perf_counter()
+
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapped(*args, **kw):
+                try:
+                    return await endpoint(*args, **kw)
+                finally:
+                    mark_end()
+        else:
+            @functools.wraps(endpoint)
+            def wrapped(*args, **kw):
+                try:
+                    return endpoint(*args, **kw)
+                finally:
+                    mark_end()
+
+        wrapped.__timed_endpoint__ = endpoint
+        super().__init__(path, wrapped, **kwargs)
+
+
+def route_template(scope) -> str:
+    """Matched route template (e.g. /api/counselees/session/{session_id}/messages)"""
+    segments = scope.get("path", "").split("/")
+    template = getattr(scope.get("route"), "path", None)
+    if template and ":path}" not in template:
+        # routes of an included router may carry only their own path, without
+        # the prefix: take the prefix segments from the request path
+        own = template.split("/")[1:]
+        if len(own) <= len(segments):
+            return "/".join(segments[:len(segments) - len(own)] + own)
+    # no matched route: put parameter names back into whole path segments,
+    # scanning from the end where parameters usually sit
+    params = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    for i in range(len(segments) - 1, 0, -1):
+        name = params.pop(segments[i], None)
+        if name is not None:
+            segments[i] = f"{{{name}}}"
+    return "/".join(segments)
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware: Server-Timing / X-Request-ID headers and JSON access logs"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        timing = {name: 0.0 for name in STAGES}
+        token = _current.set(timing)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                if timing.get("_endpoint_end"):
+                    timing["serialize"] = now - timing["_endpoint_end"]
+                status["code"] = message["status"]
+                metrics = [f"{name};dur={timing[name] * 1000:.2f}" for name in STAGES]
+                metrics.append(f"total;dur={(now - start) * 1000:.2f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(metrics).encode()))
+                headers.append((b"x-request-id", request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info("request", extra={"access": {
+                    "request_id": request_id,
+                    "method": scope.get("method"),
+                    "route": route_template(scope),
+                    "path": scope.get("path"),
+                    "status": status["code"],
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "stages_ms": {name: round(timing[name] * 1000, 2) for name in STAGES},
+                }})
+
+
+class JsonAccessFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), **getattr(record, "access", {"message": record.getMessage()})}
+        return json.dumps(entry)
+
+
+_listener = None
+_queue_handler = None
+
+
+def start_access_log(stream=None):
+    """Route luma.access through a QueueHandler; a listener thread does the writing.
+
+    Started per worker (from the app lifespan), never in a preloading master.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonAccessFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    access_logger.addHandler(_queue_handler)
+
+
+def stop_access_log():
+    """Detach the queue handler and write out whatever is still queued"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    access_logger.removeHandler(_queue_handler)
+    _listener.stop()
+    _listener = _queue_handler = None
@@ -0,0 +1,82 @@
+# Concurrent write latency while taking online backups / memory snapshots.
+#
+# For file and memory mode: measure single-row insert latency with no backup
+# running, and with back-to-back page-stepped, one-step and staged backups.
+#
+# Run from backend/:  python -m benchmarks.bench_backup --messages 200000
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_scenario(db, label: str, seconds: float, pages, staged=False):
+    latencies, stop = [], threading.Event()
+
+    def writer():
+        conn = db.get_db_conn()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            conn.execute("INSERT INTO messages(session_id, sender, message) VALUES ('s-bench','counselee','write during backup')")
+            conn.commit()
+            latencies.append(time.perf_counter() - t0)
+            time.sleep(0.002)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    backups = []
+    deadline = time.monotonic() + seconds
+    dest = os.path.join(tempfile.mkdtemp(), "backup.sqlite3")
+    while time.monotonic() < deadline:
+        if pages is None:
+            time.sleep(0.05)
+        else:
+            backups.append(db.backup_database(dest, pages=pages, staged=staged))
+    stop.set()
+    thread.join()
+
+    line = (f"{label:34} writes={len(latencies):6} p50={statistics.median(latencies) * 1000:6.2f}ms "
+            f"p99={percentile(latencies, 99) * 1000:7.2f}ms max={max(latencies) * 1000:7.1f}ms")
+    if backups:
+        line += (f" | backups={len(backups)} avg={statistics.mean(b['seconds'] for b in backups) * 1000:.0f}ms "
+                 f"restarts={sum(b['restarts'] for b in backups)}")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backup impact on write latency")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    os.environ["LUMA_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    from app.utils import db
+
+    db.init_db()
+    conn = db.get_db_conn()
+    conn.executemany(
+        "INSERT INTO messages(session_id, sender, message) VALUES (?,?,?)",
+        ((f"s-{i // 20}", "counselee", f"message {i} about exams, work, family and how I feel today") for i in range(args.messages))
+    )
+    conn.commit()
+    conn.close()
+    print(f"database: {os.path.getsize(db.DB_PATH) / 1e6:.1f} MB, {args.messages:,} messages")
+
+    for mode in ("file", "memory"):
+        db.DB_MODE = mode
+        run_scenario(db, f"{mode}: no backup", args.seconds, None)
+        run_scenario(db, f"{mode}: stepped backup (256 pages)", args.seconds, 256)
+        run_scenario(db, f"{mode}: one-step backup", args.seconds, -1)
+        run_scenario(db, f"{mode}: staged backup", args.seconds, 256, staged=True)
+
+
+if __name__ == "__main__":
+    main()
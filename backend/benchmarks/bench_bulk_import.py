@@ -0,0 +1,49 @@
+# Throughput of per-row counsellor registration vs the bulk import endpoint.
+#
+# Run from backend/:  python -m benchmarks.bench_bulk_import --rows 2000
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row vs bulk counsellor import throughput")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported
+    os.environ["LUMA_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    client = TestClient(app)
+    records = [
+        {"display_name": f"Counsellor {i}", "categories": ["Mental Health"], "languages": ["English"], "bio": "bench"}
+        for i in range(args.rows)
+    ]
+
+    start = time.perf_counter()
+    for record in records:
+        client.post("/api/counsellors/register", json=record)
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    r = client.post("/api/counsellors/bulk", json=records)
+    bulk = time.perf_counter() - start
+    ids = [row["id"] for row in r.json()["results"]]
+
+    start = time.perf_counter()
+    client.post("/api/counsellors/status/batch", json={"ids": ids, "status": "approved"})
+    approve = time.perf_counter() - start
+
+    print(f"rows: {args.rows}")
+    print(f"per-row register: {per_row:.2f}s ({args.rows / per_row:,.0f} rows/s)")
+    print(f"bulk register:    {bulk:.2f}s ({args.rows / bulk:,.0f} rows/s, {per_row / bulk:.0f}x)")
+    print(f"batch approve:    {approve:.2f}s ({args.rows / approve:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
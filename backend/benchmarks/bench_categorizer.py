@@ -0,0 +1,55 @@
+# Accuracy and throughput of the keyword categorizer vs the trained TF-IDF model.
+#
+# Run from backend/ (after training):  python -m benchmarks.bench_categorizer
+import argparse
+import os
+import time
+
+from app.nlp.category_classifier import CategoryClassifier, DEFAULT_CORPUS, read_corpus
+from app.nlp.sentiment_analyzer import SentimentAnalyzer
+
+EVAL_SET = os.path.join(os.path.dirname(__file__), "category_eval.jsonl")
+
+
+def accuracy(predicted, expected) -> float:
+    return sum(p == e for p, e in zip(predicted, expected)) / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Category classifier benchmark")
+    parser.add_argument("--messages", type=int, default=100000, help="messages for the throughput run")
+    args = parser.parse_args()
+
+    # Train fresh from the bundled corpus so the run doesn't depend on a saved artifact
+    classifier = CategoryClassifier.train(*read_corpus(DEFAULT_CORPUS))
+    keyword = SentimentAnalyzer(categorizer="keyword")
+    texts, labels = read_corpus(EVAL_SET)
+
+    print(f"held-out accuracy ({len(texts)} messages):")
+    print(f"  keyword: {accuracy([keyword.categorize_concern(t) for t in texts], labels):.1%}")
+    print(f"  model:   {accuracy(classifier.predict(texts), labels):.1%}")
+
+    corpus = (texts * (args.messages // len(texts) + 1))[:args.messages]
+    start = time.perf_counter()
+    for text in corpus:
+        keyword.categorize_concern(text)
+    keyword_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in corpus[:10000]:
+        classifier.predict_one(text)
+    single_time = (time.perf_counter() - start) * len(corpus) / 10000
+
+    start = time.perf_counter()
+    for i in range(0, len(corpus), 5000):
+        classifier.predict(corpus[i:i + 5000])
+    batch_time = time.perf_counter() - start
+
+    print(f"throughput ({len(corpus):,} messages):")
+    print(f"  keyword:             {len(corpus) / keyword_time:,.0f} msgs/s")
+    print(f"  model, one by one:   {len(corpus) / single_time:,.0f} msgs/s")
+    print(f"  model, batches 5000: {len(corpus) / batch_time:,.0f} msgs/s")
+
+
+if __name__ == "__main__":
+    main()
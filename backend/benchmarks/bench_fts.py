@@ -0,0 +1,122 @@
+# FTS5 backfill and search benchmark.
+#
+# Builds a scratch database with N pre-existing messages, runs the chunked
+# backfill while a writer thread keeps inserting messages (measuring its
+# latency), then compares ranked FTS search against a LIKE scan.
+#
+# Run from backend/:  python -m benchmarks.bench_fts --messages 2000000
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+WORDS = (
+    "anxious exam stress sleep boss deadline parents divorce lonely friends school "
+    "college job interview panic worried sad overwhelmed family relationship breakup "
+    "tired hopeless better grateful today week month money rent landlord roommate "
+    "teacher grades homework therapy counsellor talk listen help support feel really"
+).split()
+
+
+# Long tail of rarer terms so queries are selective, as in real transcripts
+RARE_WORDS = [f"term{i}" for i in range(20000)]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def populate(path: str, n: int):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT, sender TEXT, message TEXT,
+        ts INTEGER DEFAULT (strftime('%s','now'))
+    )
+    """)
+    rng = random.Random(1)
+    batch = 50000
+    for start in range(0, n, batch):
+        rows = [
+            (f"s-{i // 20}", "counselee", " ".join(
+                rng.choices(WORDS, k=rng.randint(6, 20)) + rng.choices(RARE_WORDS, k=rng.randint(0, 4))
+            ))
+            for i in range(start, min(start + batch, n))
+        ]
+        conn.executemany("INSERT INTO messages(session_id, sender, message) VALUES (?,?,?)", rows)
+        conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 backfill/search benchmark")
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--pause", type=float, default=0.01)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    os.environ["LUMA_DB_PATH"] = path
+    from app.utils.db import init_db, get_db_conn
+    from app.utils.search import backfill_fts, build_match_query
+
+    start = time.perf_counter()
+    populate(path, args.messages)
+    print(f"populated {args.messages:,} messages in {time.perf_counter() - start:.1f}s")
+    init_db()
+
+    # Live writes during the backfill
+    latencies, stop = [], threading.Event()
+
+    def writer():
+        conn = get_db_conn()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            conn.execute("INSERT INTO messages(session_id, sender, message) VALUES ('s-live','counselee','live write during backfill')")
+            conn.commit()
+            latencies.append(time.perf_counter() - t0)
+            time.sleep(0.005)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    start = time.perf_counter()
+    total = backfill_fts(chunk_size=args.chunk_size, pause=args.pause)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    print(f"backfill: {total:,} messages in {elapsed:.1f}s ({total / elapsed:,.0f} msgs/s)")
+    print(
+        f"live writes during backfill: n={len(latencies)} "
+        f"p50={statistics.median(latencies) * 1000:.2f}ms p99={percentile(latencies, 99) * 1000:.2f}ms "
+        f"max={max(latencies) * 1000:.1f}ms"
+    )
+
+    conn = get_db_conn()
+    for query in ("term42", "term7 term1234", "landlord term99", "exam panic"):
+        t0 = time.perf_counter()
+        conn.execute(
+            "SELECT m.id, snippet(messages_fts, 0, '[', ']', '…', 12), bm25(messages_fts) AS rank "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? ORDER BY rank LIMIT 20",
+            (build_match_query(query),)
+        ).fetchall()
+        fts = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        like = " AND ".join("message LIKE ?" for _ in query.split())
+        conn.execute(f"SELECT id FROM messages WHERE {like} LIMIT 20 OFFSET 1000000000",
+                     [f"%{w}%" for w in query.split()]).fetchall()
+        scan = time.perf_counter() - t0
+        print(f"query {query!r}: fts ranked top-20 {fts * 1000:.1f}ms, LIKE full scan {scan * 1000:.1f}ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Keyword extraction throughput: NLTK (Punkt + PorterStemmer) vs the fast regex/stem-cache mode.
+#
+# Run from backend/:  python -m benchmarks.bench_keywords --messages 50000
+import argparse
+import random
+import time
+
+from app.nlp.sentiment_analyzer import SentimentAnalyzer
+
+from .phrases import PHRASES
+
+
+def build_corpus(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(PHRASES, 2)) + "!" for _ in range(n)]
+
+
+def run(analyzer: SentimentAnalyzer, corpus: list) -> float:
+    start = time.perf_counter()
+    for message in corpus:
+        analyzer.extract_keywords(message)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword extraction benchmark")
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    nltk_analyzer = SentimentAnalyzer(keyword_mode="nltk")
+    fast_analyzer = SentimentAnalyzer(keyword_mode="fast")
+
+    fast = run(fast_analyzer, corpus)
+    print(f"fast: {fast:.2f}s ({args.messages / fast:,.0f} msgs/s)")
+    info = fast_analyzer._stem.cache_info()
+    print(f"      stem cache hits={info.hits} misses={info.misses}")
+
+    try:
+        slow = run(nltk_analyzer, corpus)
+    except LookupError:
+        # Punkt data missing (offline install) - nothing to compare against
+        print("nltk: skipped (punkt tokenizer data not installed)")
+        return
+    print(f"nltk: {slow:.2f}s ({args.messages / slow:,.0f} msgs/s) -> fast is {slow / fast:.1f}x")
+
+    mismatches = sum(
+        set(nltk_analyzer.extract_keywords(m)) != set(fast_analyzer.extract_keywords(m))
+        for m in corpus[:1000]
+    )
+    print(f"keyword set mismatches in first 1000 messages: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Per-worker memory with and without preloading the app/NLP engine in the master.
+#
+# Starts `python -m app.serve` in both modes, warms every worker with chatbot
+# queries, then reads /proc for each worker: RSS (what top shows), PSS (pages
+# shared with the master/siblings split between them) and USS (private pages).
+#
+# Run from backend/ (Linux only):  python -m benchmarks.bench_worker_rss --workers 4
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def memory_kb(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def children_of(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def measure(workers: int, preload: bool, queries: int) -> list:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, LUMA_DB_PATH=os.path.join(tempfile.mkdtemp(), "rss.sqlite3"))
+    cmd = [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(port),
+           "--host", "127.0.0.1", "--log-level", "warning"]
+    if not preload:
+        cmd.append("--no-preload")
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(cmd, cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        for _ in range(300):
+            try:
+                if httpx.get(base + "/api/health").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        # Distinct messages so every worker runs the NLP path, not the reply cache
+        with httpx.Client(base_url=base, timeout=30) as client:
+            for i in range(queries):
+                client.post("/api/chatbot/query", json={"message": f"I feel stressed about work {i}"})
+        time.sleep(1)
+        return [memory_kb(pid) for pid in children_of(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker RSS with/without preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        stats = measure(args.workers, preload, args.queries)
+        label = "preload + gc.freeze" if preload else "per-worker load"
+        avg = lambda key: sum(s[key] for s in stats) / len(stats) / 1024
+        total_pss = sum(s["pss"] for s in stats) / 1024
+        print(f"{label:20} workers={len(stats)} avg RSS={avg('rss'):.1f}MB "
+              f"avg PSS={avg('pss'):.1f}MB avg USS={avg('uss'):.1f}MB total PSS={total_pss:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
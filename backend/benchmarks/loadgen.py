@@ -0,0 +1,228 @@
+# Scenario load generator: counselees, counsellors and the chatbot together.
+#
+# Simulated counselees start a session, talk to the chatbot, send messages and
+# poll their transcript (with ETags); simulated counsellors poll the waiting
+# room and accept sessions. Reports throughput and p50/p95/p99 per endpoint,
+# SQLite lock errors and cache hit rates.
+#
+# Run from backend/ (spawns a local server on a scratch database by default):
+#   python -m benchmarks.loadgen --counselees 50 --counsellors 5 --duration 30 --report run.json
+# or against an already running app:
+#   python -m benchmarks.loadgen --base-url http://localhost:8000
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+from .phrases import PHRASES
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.cache = defaultdict(lambda: {"hits": 0, "total": 0})
+        # only known when the server's stderr is ours to watch (spawned server)
+        self.lock_errors = None
+
+    def record(self, endpoint: str, elapsed: float, status: int):
+        self.latencies[endpoint].append(elapsed)
+        self.statuses[endpoint][status] += 1
+
+    def cache_result(self, name: str, hit: bool):
+        self.cache[name]["total"] += 1
+        self.cache[name]["hits"] += int(hit)
+
+    def report(self, duration: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            pick = lambda pct: values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "rps": round(len(values) / duration, 1),
+                "p50_ms": round(pick(50), 2),
+                "p95_ms": round(pick(95), 2),
+                "p99_ms": round(pick(99), 2),
+                "statuses": dict(self.statuses[endpoint]),
+                "errors": self.errors.get(endpoint, 0),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "duration_s": round(duration, 1),
+            "total_requests": total,
+            "total_rps": round(total / duration, 1),
+            "endpoints": endpoints,
+            "sqlite_lock_errors": self.lock_errors,
+            "cache": {
+                name: {**c, "hit_rate": round(c["hits"] / c["total"], 3) if c["total"] else None}
+                for name, c in self.cache.items()
+            },
+        }
+
+
+async def call(client, stats, endpoint, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        stats.errors[endpoint] += 1
+        return None
+    stats.record(endpoint, time.perf_counter() - start, response.status_code)
+    return response
+
+
+async def counselee(client, stats, args, deadline, rng):
+    r = await call(client, stats, "POST /session/start", "POST", "/api/counselees/session/start")
+    if r is None or r.status_code != 200:
+        return
+    session_id = r.json()["session_id"]
+    etag = None
+    while time.monotonic() < deadline:
+        message = rng.choice(PHRASES)
+        r = await call(client, stats, "POST /chatbot/query", "POST", "/api/chatbot/query",
+                       json={"message": message, "session_id": session_id})
+        if r is not None and r.status_code == 200:
+            stats.cache_result("chatbot_query", r.json().get("response_time") == "cached")
+        await call(client, stats, "POST /session/{id}/message", "POST",
+                   f"/api/counselees/session/{session_id}/message", json={"message": message})
+        for _ in range(args.polls):
+            headers = {"If-None-Match": etag} if etag else {}
+            r = await call(client, stats, "GET /session/{id}/messages", "GET",
+                           f"/api/counselees/session/{session_id}/messages", headers=headers)
+            if r is not None:
+                stats.cache_result("transcript_etag", r.status_code == 304)
+                etag = r.headers.get("etag", etag)
+            await asyncio.sleep(args.poll_interval)
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def counsellor(client, stats, args, deadline, rng, counsellor_id):
+    etag = None
+    while time.monotonic() < deadline:
+        r = await call(client, stats, "GET /sessions/available", "GET", "/api/counsellors/sessions/available")
+        if r is not None and r.status_code == 200:
+            sessions = r.json()["sessions"]
+            if sessions and rng.random() < args.accept_rate:
+                session_id = rng.choice(sessions[:10])["session_id"]
+                await call(client, stats, "POST /sessions/{id}/accept", "POST",
+                           f"/api/counsellors/sessions/{session_id}/accept",
+                           params={"counsellor_id": counsellor_id})
+        headers = {"If-None-Match": etag} if etag else {}
+        r = await call(client, stats, "GET /counsellors/", "GET", "/api/counsellors/", headers=headers)
+        if r is not None:
+            stats.cache_result("counsellor_etag", r.status_code == 304)
+            etag = r.headers.get("etag", etag)
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def run(args, base_url, stats) -> float:
+    limits = httpx.Limits(max_connections=args.counselees + args.counsellors)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        r = await client.post("/api/counsellors/bulk", json=[
+            {"display_name": f"Load Counsellor {i}", "categories": ["Mental Health"], "languages": ["English"]}
+            for i in range(args.counsellors)
+        ])
+        ids = [row["id"] for row in r.json()["results"] if row["result"] == "created"]
+        await client.post("/api/counsellors/status/batch", json={"ids": ids, "status": "approved"})
+
+        rng = random.Random(args.seed)
+        start = time.monotonic()
+        deadline = start + args.duration
+        tasks = [counselee(client, stats, args, deadline, random.Random(rng.random())) for _ in range(args.counselees)]
+        tasks += [counsellor(client, stats, args, deadline, random.Random(rng.random()), cid) for cid in ids]
+        await asyncio.gather(*tasks)
+        return time.monotonic() - start
+
+
+def spawn_server(args, stats):
+    """Start uvicorn on a free port with a scratch DB; count lock errors from its stderr"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    stats.lock_errors = 0
+    env = dict(os.environ, LUMA_DB_PATH=os.path.join(tempfile.mkdtemp(), "load.sqlite3"))
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=backend_dir, env=env, stderr=subprocess.PIPE, text=True,
+    )
+
+    def watch_stderr():
+        for line in proc.stderr:
+            if "database is locked" in line or "database table is locked" in line:
+                stats.lock_errors += 1
+
+    threading.Thread(target=watch_stderr, daemon=True).start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(base_url + "/api/health").status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("server did not start")
+
+
+def print_report(report: dict):
+    print(f"{report['total_requests']} requests in {report['duration_s']}s ({report['total_rps']} req/s)")
+    print(f"{'endpoint':32} {'reqs':>7} {'rps':>7} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}  statuses")
+    for name, e in report["endpoints"].items():
+        print(f"{name:32} {e['requests']:>7} {e['rps']:>7} {e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8}  {e['statuses']}")
+    lock_errors = report["sqlite_lock_errors"]
+    print(f"sqlite lock errors: {'not measured (--base-url)' if lock_errors is None else lock_errors}")
+    for name, c in report["cache"].items():
+        print(f"cache {name}: {c['hits']}/{c['total']} hit rate {c['hit_rate']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Luma scenario load generator")
+    parser.add_argument("--base-url", help="target a running app instead of spawning one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--counselees", type=int, default=20)
+    parser.add_argument("--counsellors", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between actions")
+    parser.add_argument("--polls", type=int, default=3, help="transcript polls per message")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--accept-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--report", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    stats = Stats()
+    proc = None
+    base_url = args.base_url
+    if not base_url:
+        proc, base_url = spawn_server(args, stats)
+    try:
+        duration = asyncio.run(run(args, base_url, stats))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = stats.report(duration)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "report"}
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
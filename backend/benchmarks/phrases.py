@@ -0,0 +1,14 @@
+# Sample counselee messages shared by the benchmarks (no app imports, so the
+# load generator stays a plain HTTP client).
+PHRASES = [
+    "I've been feeling really anxious about my exams",
+    "my boyfriend and I keep fighting and I don't know what to do",
+    "work has been overwhelming and my boss keeps adding deadlines",
+    "I can't sleep, I'm stressed and worried all the time",
+    "my parents are getting a divorce and home feels tense",
+    "hi, I just wanted to talk to someone today",
+    "things are going better this week, thanks for listening",
+    "I feel hopeless and worthless lately",
+    "college applications are stressing me out so much",
+    "my friends stopped talking to me and I feel lonely",
+]
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from backend.app.main import app
@@ -13,3 +14,322 @@ def test_start_session():
     r = client.post("/api/counselees/session/start")
     assert r.status_code == 200
     assert "session_id" in r.json()
+
+def test_counsellor_listing_etag():
+    r = client.get("/api/counsellors/")
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    r = client.get("/api/counsellors/", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    client.post("/api/counsellors/register", json={
+        "display_name": "ETag Test", "categories": ["Career"], "languages": ["English"]
+    })
+    r = client.get("/api/counsellors/", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+def test_messages_etag():
+    sid = client.post("/api/counselees/session/start").json()["session_id"]
+    r = client.get(f"/api/counselees/session/{sid}/messages")
+    etag = r.headers["etag"]
+    assert client.get(f"/api/counselees/session/{sid}/messages", headers={"If-None-Match": etag}).status_code == 304
+    client.post(f"/api/counselees/session/{sid}/message", json={"message": "hello"})
+    r = client.get(f"/api/counselees/session/{sid}/messages", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["messages"][0]["message"] == "hello"
+
+def test_chatbot_load_shedding_keeps_crisis_detection():
+    from backend.app.routes import chatbot
+    controller = chatbot.admission_controller
+    hard_limit = controller.hard_limit
+    controller.hard_limit = 0
+    try:
+        r = client.post("/api/chatbot/query", json={"message": "tell me about shedding load"})
+        assert r.status_code == 429
+        assert client.get("/api/chatbot/health").json()["mode"] == "shedding"
+        r = client.post("/api/chatbot/query", json={"message": "I want to die"})
+        assert r.status_code == 200
+        assert r.json()["should_escalate"] is True
+        # medium risk by the analyzer's scan, though no CRISIS_KEYWORDS entry matches
+        assert chatbot.load_nlp_components()
+        r = client.post("/api/chatbot/query", json={"message": "I feel hopeless and worthless, I want to self harm"})
+        assert r.status_code == 200
+        assert r.json()["crisis_level"] == "medium" and r.json()["should_escalate"] is True
+    finally:
+        controller.hard_limit = hard_limit
+
+def test_chatbot_sheds_queued_burst_with_default_limits(monkeypatch):
+    import asyncio, socket, threading, time
+    import httpx, uvicorn
+    from backend.app.routes import chatbot
+    controller = chatbot.admission_controller
+    assert (controller.soft_limit, controller.hard_limit) == (4, 32)
+    quick = chatbot.get_quick_response
+
+    def slow_quick(message):
+        time.sleep(0.003)  # reply work that holds the event loop
+        return quick(message)
+    monkeypatch.setattr(chatbot, "get_quick_response", slow_quick)
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="off", log_level="warning"))
+
+    async def serve():
+        controller.start_monitor()
+        try:
+            await server.serve(sockets=[sock])
+        finally:
+            controller.stop_monitor()
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    async def burst():
+        limits = httpx.Limits(max_connections=300)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30, limits=limits) as c:
+            replies = await asyncio.gather(*(
+                c.post("/api/chatbot/query", json={"message": f"tell me about my week, day {i}"})
+                for i in range(300)
+            ))
+        return [r.status_code for r in replies]
+    try:
+        statuses = asyncio.run(burst())
+    finally:
+        server.should_exit = True
+        thread.join(10)
+    assert statuses.count(429) > 0 and statuses.count(200) > 0
+    assert set(statuses) == {200, 429}
+
+def test_bulk_register_and_batch_approve():
+    records = [
+        {"display_name": "Bulk One", "categories": ["Career"], "languages": ["English"]},
+        {"display_name": "Bulk Two"},
+        {"display_name": "Bulk Three", "categories": ["Family"], "languages": ["French"], "bio": "x"},
+    ]
+    r = client.post("/api/counsellors/bulk", json=records)
+    body = r.json()
+    assert body["created"] == 2 and body["failed"] == 1
+    assert [row["result"] for row in body["results"]] == ["created", "error", "created"]
+    ids = [row["id"] for row in body["results"] if row["result"] == "created"]
+
+    ndjson = "\n".join(json.dumps(rec) for rec in (records[0], records[2]))
+    r = client.post("/api/counsellors/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert r.json()["created"] == 2
+
+    r = client.post("/api/counsellors/status/batch", json={"ids": ids + [10**9], "status": "approved"})
+    assert r.json()["updated"] == 2
+    assert r.json()["results"][-1]["result"] == "not_found"
+    approved = {c["id"] for c in client.get("/api/counsellors/").json()}
+    assert set(ids) <= approved
+
+def test_fast_keyword_extraction():
+    from backend.app.nlp.sentiment_analyzer import SentimentAnalyzer
+    analyzer = SentimentAnalyzer(keyword_mode="fast")
+    keywords = analyzer.extract_keywords("Exams, exams and more EXAMS... I'm worried!")
+    assert keywords[0] == "exam"
+    assert keywords.count("exam") == 1
+    assert "worri" in keywords
+
+def test_analytics_rollups():
+    before = client.get("/api/analytics/wait-times").json()["accepted_sessions"]
+    sid = client.post("/api/counselees/session/start").json()["session_id"]
+    client.post("/api/chatbot/query", json={"message": "I want to die", "session_id": sid})
+    from backend.app.routes import chatbot
+    assert chatbot.conversation_writer.flush()
+    assert client.post(f"/api/counsellors/sessions/{sid}/accept", params={"counsellor_id": 1}).json()["status"] == "accepted"
+
+    waits = client.get("/api/analytics/wait-times").json()
+    assert waits["accepted_sessions"] == before + 1
+    hourly = client.get("/api/analytics/hourly", params={"event": "escalation"}).json()["buckets"]
+    assert any(b["crisis_level"] == "high" and b["count"] >= 1 for b in hourly)
+
+def test_transcript_search():
+    sid = client.post("/api/counselees/session/start").json()["session_id"]
+    client.post(f"/api/counselees/session/{sid}/message", json={"message": "my landlord keeps raising the rent"})
+    client.post(f"/api/counselees/session/{sid}/message", json={"message": "unrelated message"})
+    r = client.get("/api/search/messages", params={"q": "landlord rent", "session_id": sid})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert len(results) == 1
+    assert "[landlord]" in results[0]["snippet"]
+    assert client.get("/api/search/messages", params={"q": "***"}).status_code == 400
+
+def test_category_classifier_batch_predict():
+    from backend.app.nlp.category_classifier import CategoryClassifier, DEFAULT_CORPUS, read_corpus
+    classifier = CategoryClassifier.train(*read_corpus(DEFAULT_CORPUS))
+    predicted = classifier.predict(["my boss wants me to work every weekend", "my parents fight all the time at home"])
+    assert predicted == ["career", "family"]
+    assert classifier.predict([]) == []
+
+def test_batch_analyze_stream_and_write_back(monkeypatch):
+    # pool workers build their own analyzer; fast keywords need no NLTK data
+    from backend.app.nlp import batch
+    batch.shutdown_pool()
+    monkeypatch.setattr(batch, "KEYWORD_MODE", "fast")
+    monkeypatch.setattr(batch, "_analyzer", None)
+    r = client.post("/api/chatbot/analyze/batch", json=["I want to die", "my exam is tomorrow", "hello"])
+    assert r.status_code == 200
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["index"] for row in rows] == [0, 1, 2]
+    assert rows[0]["crisis_level"] == "high"
+
+    # null / non-string records are coerced, not a 500
+    r = client.post("/api/chatbot/analyze/batch", json=[{"message": None}, {"message": 5}, None])
+    assert r.status_code == 200
+    assert [json.loads(line)["index"] for line in r.text.splitlines()] == [0, 1, 2]
+    ndjson = "\n".join(json.dumps(rec) for rec in ({"message": None}, {"message": 5}))
+    r = client.post("/api/chatbot/analyze/batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200 and len(r.text.splitlines()) == 2
+
+    sid = client.post("/api/counselees/session/start").json()["session_id"]
+    client.post(f"/api/counselees/session/{sid}/message", json={"message": "I feel hopeless and worthless"})
+    last_id = client.get("/api/search/messages", params={"q": "hopeless worthless", "session_id": sid}).json()["results"][0]["message_id"]
+    r = client.post("/api/chatbot/analyze/batch", json={"from_id": last_id, "to_id": last_id, "write_back": True})
+    assert json.loads(r.text.splitlines()[0])["crisis_level"] == "medium"
+
+    from backend.app.utils.db import get_db_conn
+    conn = get_db_conn()
+    row = conn.execute("SELECT crisis_level FROM messages WHERE id=?", (last_id,)).fetchone()
+    conn.close()
+    assert row[0] == "medium"
+    batch.shutdown_pool()
+
+def test_nlp_engine_is_shared():
+    from backend.app.nlp import engine
+    assert engine.get_response_generator().sentiment_analyzer is engine.get_sentiment_analyzer()
+
+def test_chatbot_exchange_persisted_to_session():
+    from backend.app.routes import chatbot
+    sid = client.post("/api/counselees/session/start").json()["session_id"]
+    client.post("/api/chatbot/query", json={"message": "I feel hopeless and worthless", "session_id": sid})
+    client.post("/api/chatbot/query", json={"message": "hello", "session_id": sid})
+    assert chatbot.conversation_writer.flush()
+
+    messages = client.get(f"/api/counselees/session/{sid}/messages").json()["messages"]
+    assert [m["sender"] for m in messages] == ["counselee", "bot", "counselee", "bot"]
+    waiting = {s["session_id"]: s for s in client.get("/api/counsellors/sessions/available").json()["sessions"]}
+    assert sid in waiting
+    metrics = client.get("/api/chatbot/health").json()["persistence"]
+    assert metrics["queue_depth"] == 0 and metrics["written"] >= 2
+
+def test_online_backup_and_memory_snapshot(tmp_path, monkeypatch):
+    import sqlite3
+    from backend.app.utils import db
+    client.post("/api/counselees/session/start")
+    backup_path = str(tmp_path / "backup.sqlite3")
+    db.backup_database(backup_path)
+    copy = sqlite3.connect(backup_path)
+    assert copy.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] >= 1
+    copy.close()
+
+    # memory mode restores from the snapshot file and persists back to it
+    monkeypatch.setattr(db, "DB_MODE", "memory")
+    monkeypatch.setattr(db, "DB_PATH", backup_path)
+    monkeypatch.setattr(db, "MEMORY_URI", "file:/luma-test?vfs=memdb")
+    monkeypatch.setattr(db, "_memory_anchor", None)
+    monkeypatch.setattr(db, "_memory_lock", None)
+    conn = db.get_db_conn()
+    conn.execute("INSERT INTO sessions(session_id, created_at, meta) VALUES ('s-memory', 0, '{}')")
+    conn.commit()
+    conn.close()
+    db.Snapshotter(interval=3600).snapshot()
+    copy = sqlite3.connect(backup_path)
+    assert copy.execute("SELECT COUNT(*) FROM sessions WHERE session_id='s-memory'").fetchone()[0] == 1
+    copy.close()
+
+    # a second process (e.g. another uvicorn worker) may not serve the same file
+    # from memory, and the backup CLI would only copy the last snapshot
+    import os, subprocess, sys
+    backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+    env = dict(os.environ, LUMA_DB_MODE="memory", LUMA_DB_PATH=backup_path)
+    other = subprocess.run([sys.executable, "-c", "from app.utils import db; db.get_db_conn()"],
+                           cwd=backend_dir, env=env, capture_output=True, text=True)
+    assert other.returncode != 0 and "already served from memory" in other.stderr
+    cli = subprocess.run([sys.executable, "-m", "app.utils.db", "backup", str(tmp_path / "cli.sqlite3")],
+                         cwd=backend_dir, env=env, capture_output=True, text=True)
+    assert cli.returncode != 0 and not os.path.exists(tmp_path / "cli.sqlite3")
+
+def test_server_timing_and_access_log():
+    import logging
+    from backend.app.utils import timing
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    timing.access_logger.addHandler(handler)
+    try:
+        sid = client.post("/api/counselees/session/start").json()["session_id"]
+        r = client.get(f"/api/counselees/session/{sid}/messages", headers={"X-Request-ID": "req-123"})
+        # an id that is also a substring / segment of the route itself
+        client.get("/api/counselees/session/s/messages")
+        client.get("/api/counselees/session/session/messages")
+    finally:
+        timing.access_logger.removeHandler(handler)
+    assert r.headers["x-request-id"] == "req-123"
+    stages = dict(m.strip().split(";dur=") for m in r.headers["server-timing"].split(","))
+    assert set(stages) == {"db", "cache", "nlp", "serialize", "total"}
+    assert float(stages["db"]) > 0
+    assert [rec.access["route"] for rec in records[-2:]] == ["/api/counselees/session/{session_id}/messages"] * 2
+    records = records[:-2]
+    entry = records[-1].access
+    assert entry["request_id"] == "req-123" and entry["status"] == 200
+    assert entry["route"] == "/api/counselees/session/{session_id}/messages"
+    assert json.loads(timing.JsonAccessFormatter().format(records[-1]))["path"] == f"/api/counselees/session/{sid}/messages"
+
+def test_send_message_idempotent():
+    from backend.app.routes import counselees
+    sid = client.post("/api/counselees/session/start").json()["session_id"]
+    url = f"/api/counselees/session/{sid}/message"
+    first = client.post(url, json={"message": "hi", "client_message_id": "m-1"}).json()
+    assert first["duplicate"] is False
+    retry = client.post(url, json={"message": "hi", "client_message_id": "m-1"}).json()
+    assert retry["duplicate"] is True and retry["message_id"] == first["message_id"]
+
+    # after the in-memory window forgets the id, the unique index still catches it
+    counselees.recent_messages.clear()
+    replay = client.post(url, json={"message": "hi"}, headers={"Idempotency-Key": "m-1"}).json()
+    assert replay["duplicate"] is True and replay["message_id"] == first["message_id"]
+    assert replay["timestamp"] == first["timestamp"]
+    client.post(url, json={"message": "no key"})
+    client.post(url, json={"message": "no key"})
+    messages = client.get(f"/api/counselees/session/{sid}/messages").json()["messages"]
+    assert [m["message"] for m in messages] == ["hi", "no key", "no key"]
+
+def test_memory_mode_respawned_worker_loads_latest_snapshot(tmp_path, monkeypatch):
+    import os, sqlite3
+    from backend.app import serve
+    from backend.app.utils import db
+    path = str(tmp_path / "memory.sqlite3")
+    monkeypatch.setattr(db, "DB_MODE", "memory")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    monkeypatch.setattr(db, "MEMORY_URI", "file:/luma-master?vfs=memdb")
+    monkeypatch.setattr(db, "_memory_anchor", None)
+    monkeypatch.setattr(db, "_memory_lock", None)
+    db.init_db()  # the preloading master's startup copy
+    db.backup_database(path)
+    # an earlier worker wrote a session and snapshotted it before dying
+    disk = sqlite3.connect(path)
+    disk.execute("INSERT INTO sessions(session_id, created_at, meta) VALUES ('s-earlier', 0, '{}')")
+    disk.commit()
+    disk.close()
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            serve.init_worker(app)
+            conn = db.get_db_conn()
+            conn.execute("INSERT INTO sessions(session_id, created_at, meta) VALUES ('s-respawned', 0, '{}')")
+            conn.commit()
+            conn.close()
+            db.Snapshotter(interval=3600).snapshot()
+            code = 0
+        finally:
+            os._exit(code)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+    disk = sqlite3.connect(path)
+    rows = {r[0] for r in disk.execute("SELECT session_id FROM sessions")}
+    disk.close()
+    assert {"s-earlier", "s-respawned"} <= rows